@@ -0,0 +1,112 @@
+"""
+Admission control for the CPU-heavy prediction routes.
+
+Each worker process admits at most `max_concurrent` requests into the
+decode/feature/predict path at once; the rest wait for a slot, but only until
+their queue deadline. A request that cannot start in time is shed
+immediately with 503 and Retry-After, instead of holding a connection until
+gunicorn's timeout kills the worker.
+
+Time spent queued in front of the app counts against the deadline too: when
+the router stamps requests with X-Request-Start (Heroku, or nginx's
+"t=<seconds>" form), a request that already waited too long in the listen
+backlog is shed before it costs any CPU. With sync gunicorn workers that
+backlog is the only queue, so this is what bounds it.
+"""
+import time
+import threading
+
+from metrics import REGISTRY, Counter, Histogram, CallbackGauge
+
+ADMISSIONS = REGISTRY.register(Counter(
+    'rolex_admission_total', 'Prediction requests admitted or shed (with the reason)', ('outcome', 'reason')))
+QUEUE_SECONDS = REGISTRY.register(Histogram(
+    'rolex_admission_queue_seconds', 'Time from arrival (X-Request-Start if present) to admission or shedding'))
+
+
+class Overloaded(Exception):
+    """No slot could be had before the request's queue deadline"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def upstream_queue_seconds(header, now=None):
+    """
+    Seconds since the router stamped the request, from an X-Request-Start
+    value in ms or µs since the epoch (Heroku) or "t=<seconds>" (nginx);
+    0 when the header is missing or unparseable
+    """
+    if not header:
+        return 0.0
+    try:
+        stamp = float(header.strip().removeprefix('t='))
+    except ValueError:
+        return 0.0
+    # Normalize to seconds whatever unit the router used
+    while stamp > 1e11:
+        stamp /= 1000
+    return max(0.0, (now or time.time()) - stamp)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=1, queue_timeout=10.0, retry_after=5):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        REGISTRY.register(CallbackGauge(
+            'rolex_admission_in_flight', 'Prediction requests currently admitted', lambda: self.in_flight))
+        REGISTRY.register(CallbackGauge(
+            'rolex_admission_waiting', 'Prediction requests waiting for a slot', lambda: self.waiting))
+
+    def _shed(self, reason, queued):
+        QUEUE_SECONDS.observe(queued)
+        ADMISSIONS.inc(outcome='shed', reason=reason)
+        raise Overloaded(reason, self.retry_after)
+
+    def acquire(self, queued_for=0.0):
+        """
+        Take a slot, waiting at most what is left of the queue deadline after
+        `queued_for` seconds already spent upstream. Returns the total queue
+        time in seconds; raises Overloaded if the deadline passes first.
+        """
+        remaining = self.queue_timeout - queued_for
+        if remaining <= 0:
+            self._shed('deadline', queued_for)
+
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=remaining)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        queued = queued_for + time.monotonic() - started
+        if not acquired:
+            self._shed('timeout', queued)
+
+        with self._lock:
+            self.in_flight += 1
+        QUEUE_SECONDS.observe(queued)
+        ADMISSIONS.inc(outcome='admitted', reason='')
+        return queued
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            'max_concurrent': self.max_concurrent,
+            'queue_timeout_s': self.queue_timeout,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+        }
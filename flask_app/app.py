@@ -1,18 +1,52 @@
-from flask import Flask, render_template, request, redirect, jsonify, flash
-from pydub import AudioSegment
-from sklearn.ensemble import RandomForestClassifier
-import os, uuid
-import joblib
-import numpy as np
-import librosa
-import tempfile
+import time
+
+# Reference point for startup timings reported by /health
+APP_IMPORT_STARTED = time.perf_counter()
+
+from flask import (Flask, render_template, request, redirect, jsonify, flash, url_for, Response, g,
+                   has_request_context, stream_with_context)
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+import os
+import io
+import gc
+import json
+import wave
 import shutil
+import hashlib
+import functools
 import logging
 import sys
+import threading
+
+# Make sibling modules importable whether we're started from the project root,
+# from api/index.py, or from inside flask_app/
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Cap BLAS/OpenMP threads (CPU_THREADS) before numpy and librosa load them
+import cpu_pool
+cpu_pool.prepare_web_process()
+
+import numpy as np
+
+from audio_decoder import (decode_audio, decode_with_ffmpeg, iter_decode_upload, resample, pcm16_to_float32,
+                           DecodeError)
+from feature_engine import extract_feature_vector, extract_feature_batch, FEATURE_NAMES
+from pipeline import extract_features
+from result_cache import ResultCache, content_key, prefix_key, PREFIX_BYTES
+from forest_compiler import compile_model, compiled_path_for, load_compiled
+from model_registry import ModelRegistry, ServedModel
+from job_queue import JobQueue, QueueFull
+from streaming import score_windows, score_buffer, WINDOW_SECONDS, HOP_SECONDS
+import metrics
+from metrics import span, ERRORS, DECODES, CallbackGauge
+from upload_stream import open_upload, limit_duration, UploadError, AudioTooLong
+from admission import AdmissionController, Overloaded, upstream_queue_seconds
+from log_config import configure_logging
 
-# Set up logging for better debugging
-logging.basicConfig(level=logging.INFO)
+# LOG_LEVEL / LOG_FORMAT, see log_config.py; per-stage traces are DEBUG only
+configure_logging()
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger('rolex.access')
 
 # Configure environment for PulseAudio libraries (Heroku fix)
 if 'LD_LIBRARY_PATH' in os.environ:
@@ -23,8 +57,8 @@ else:
 # Also set PULSE_RUNTIME_PATH to avoid PulseAudio runtime issues
 os.environ['PULSE_RUNTIME_PATH'] = '/tmp/pulse'
 
-logger.info(f"LD_LIBRARY_PATH set to: {os.environ.get('LD_LIBRARY_PATH')}")
-logger.info(f"PULSE_RUNTIME_PATH set to: {os.environ.get('PULSE_RUNTIME_PATH')}")
+logger.debug("LD_LIBRARY_PATH set to: %s", os.environ.get('LD_LIBRARY_PATH'))
+logger.debug("PULSE_RUNTIME_PATH set to: %s", os.environ.get('PULSE_RUNTIME_PATH'))
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here-change-this')
@@ -33,237 +67,534 @@ app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here-change-this'
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
 
-# Use temporary directory for uploads (Heroku has ephemeral filesystem)
-UPLOAD_FOLDER = tempfile.mkdtemp()
-
 # Model path - prioritize Heroku-friendly paths
 MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model", "rolex_model.pkl")
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'flac', 'ogg', 'webm'}
 
-# Ensure upload folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Upload caps. Werkzeug rejects bodies over MAX_UPLOAD_MB with a 413, before
+# reading anything when the Content-Length already says so; streamed uploads
+# stop decoding as soon as more than MAX_AUDIO_SECONDS of audio comes out
+MAX_UPLOAD_MB = float(os.environ.get('MAX_UPLOAD_MB', 50))
+MAX_AUDIO_SECONDS = float(os.environ.get('MAX_AUDIO_SECONDS', 600))
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+# Batch prediction limit
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 64))
+
+# Decoding/featurizing runs on a bounded pool with BLAS/OpenMP threads capped
+# per worker (CPU_EXECUTOR=thread|process, CPU_WORKERS, CPU_THREADS; see cpu_pool.py)
+cpu_executor = cpu_pool.from_env()
+
+# Admission control for the prediction routes (admission.py), per worker
+# process: at most ADMISSION_MAX_CONCURRENT requests decode/featurize at once
+# (default 1, or CPU_WORKERS with the process pool),
+# others wait up to ADMISSION_QUEUE_TIMEOUT seconds (counting time queued
+# upstream, per X-Request-Start, unless ADMISSION_TRUST_REQUEST_START=0) and
+# are then shed with 503 + Retry-After
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('ADMISSION_MAX_CONCURRENT',
+                                      cpu_executor.workers if cpu_executor.mode == 'process' else 1)),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10)),
+    retry_after=int(os.environ.get('ADMISSION_RETRY_AFTER', 5)),
+)
+ADMISSION_TRUST_REQUEST_START = os.environ.get('ADMISSION_TRUST_REQUEST_START', '1') != '0'
 
-# Load the model with better error handling for Heroku
-try:
-    # Primary path for Heroku
-    if os.path.exists(MODEL_PATH):
-        model = joblib.load(MODEL_PATH)
-        logger.info("✓ Model loaded successfully from primary path")
+# Startup mode:
+#   eager      - import the model (and sklearn) at import time (default)
+#   lazy       - defer heavy imports and the model load until the first request needing them
+#   background - start importing/loading in a warm-up thread so /health answers immediately
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'eager').lower()
+
+# Import and load timings in seconds, reported by /health
+STARTUP_TIMINGS = {}
+
+def timed(name, fn):
+    started = time.perf_counter()
+    result = fn()
+    STARTUP_TIMINGS[name] = round(time.perf_counter() - started, 4)
+    return result
+
+# Serve from the memory-mapped compiled forest when a fresh export exists:
+# no sklearn import or unpickling, and every gunicorn worker maps the same
+# read-only pages. MODEL_MMAP=0 loads the joblib pickle instead.
+MODEL_MMAP = os.environ.get('MODEL_MMAP', '1') != '0'
+
+# Versioned model registry (model_registry.py); without one the app serves
+# the plain rolex_model.pkl as before. Workers check CURRENT at most every
+# MODEL_RELOAD_INTERVAL seconds and load a newly activated version in the
+# background, so requests never wait for a reload.
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR') or next(
+    (path for path in (os.path.join(BASE_DIR, "model", "registry"), os.path.join(PROJECT_ROOT, "model", "registry"))
+     if os.path.isdir(path)),
+    os.path.join(PROJECT_ROOT, "model", "registry"),
+)
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 2))
+registry = ModelRegistry(MODEL_REGISTRY_DIR)
+
+# The model being served: a ServedModel, replaced by a single assignment
+served = None
+model_load_attempted = False
+_model_lock = threading.Lock()
+_reload = {"checked_at": 0.0, "loading": None, "failed": None}
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def compiled_is_fresh(model_path):
+    """True if the compiled export exists and is at least as new as the pickle"""
+    compiled_path = compiled_path_for(model_path)
+    return os.path.exists(compiled_path) and os.path.getmtime(compiled_path) >= os.path.getmtime(model_path)
+
+def find_model_path():
+    """Primary path for Heroku, then the project-level and current directory copies"""
+    candidates = [
+        MODEL_PATH,
+        os.path.join(BASE_DIR, "..", "model", "rolex_model.pkl"),
+        os.path.join("model", "rolex_model.pkl"),
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("Model file not found in any expected location")
+
+def load_version(path, version, metadata=None, timer=timed):
+    """
+    Load one model file (and its compiled forest) into a ServedModel; `timer`
+    records load times (startup timings only for the initial load)
+    """
+    if metadata and metadata.get('feature_names', FEATURE_NAMES) != FEATURE_NAMES:
+        raise ValueError(f"Model {version} was trained on a different feature schema")
+    if MODEL_MMAP and compiled_is_fresh(path):
+        model = timer('model_load_s', lambda: load_compiled(compiled_path_for(path), mmap_mode='r'))
+        logger.info(f"✓ Compiled forest memory-mapped from {compiled_path_for(path)}")
+        predictor = model
     else:
-        # Alternative relative path
-        alt_model_path = os.path.join(BASE_DIR, "..", "model", "rolex_model.pkl")
-        if os.path.exists(alt_model_path):
-            model = joblib.load(alt_model_path)
-            logger.info("✓ Model loaded successfully from alternative path")
+        joblib = timer('import_joblib_s', lambda: __import__('joblib'))
+        timer('import_sklearn_s', lambda: __import__('sklearn.ensemble'))
+        model = timer('model_load_s', lambda: joblib.load(path))
+        logger.info(f"✓ Model loaded successfully from {path}")
+        predictor = timer('model_compile_s', lambda: load_predictor(model, path))
+    return ServedModel(version, model, predictor, path, metadata)
+
+def load_model():
+    """Load the active registry version, or the plain model file, into `served`"""
+    global served, model_load_attempted
+
+    # Load the model with better error handling for Heroku
+    try:
+        version = registry.current_version()
+        if version:
+            served = load_version(registry.model_path(version), version, registry.metadata(version))
         else:
-            # Try current directory
-            current_model_path = os.path.join("model", "rolex_model.pkl")
-            if os.path.exists(current_model_path):
-                model = joblib.load(current_model_path)
-                logger.info("✓ Model loaded successfully from current directory")
-            else:
-                raise FileNotFoundError("Model file not found in any expected location")
-except Exception as e:
-    logger.error(f"✗ Error loading model: {e}")
-    logger.error(f"Current working directory: {os.getcwd()}")
-    logger.error(f"Files in current directory: {os.listdir('.')}")
-    if os.path.exists('model'):
-        logger.error(f"Files in model directory: {os.listdir('model')}")
-    else:
-        logger.error("Model directory not found")
-    model = None
+            path = find_model_path()
+            # Identifies the model in cache keys so a retrained model never serves stale results
+            served = load_version(path, file_digest(path))
+        logger.info(f"Serving model version {served.version}")
+    except Exception as e:
+        logger.error(f"✗ Error loading model: {e}")
+        logger.error(f"Current working directory: {os.getcwd()}")
+        logger.error(f"Files in current directory: {os.listdir('.')}")
+        if os.path.exists('model'):
+            logger.error(f"Files in model directory: {os.listdir('model')}")
+        else:
+            logger.error("Model directory not found")
+        served = None
+
+    model_load_attempted = True
+    _reload["checked_at"] = time.monotonic()
+    logger.info(f"Startup timings: {STARTUP_TIMINGS}")
+
+def ensure_model():
+    """
+    The ServedModel for this request, loading it on first use (thread-safe),
+    or None. Within a request the first call pins the version, so a reload
+    never mixes two models in one response.
+    """
+    if not model_load_attempted:
+        with _model_lock:
+            if not model_load_attempted:
+                load_model()
+    if has_request_context():
+        if 'served' not in g:
+            g.served = served
+        return g.served
+    return served
+
+def _load_new_version(version):
+    global served
+    try:
+        started = time.perf_counter()
+        served = load_version(registry.model_path(version), version, registry.metadata(version),
+                              timer=lambda name, fn: fn())
+        logger.info(f"Hot-reloaded model version {version} in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        # Not retried until another version is activated
+        _reload["failed"] = version
+        logger.error(f"Could not load model version {version}, still serving the previous one: {e}")
+    finally:
+        _reload["loading"] = None
+
+@app.before_request
+def check_model_version():
+    """Start loading a newly activated registry version; never blocks the request"""
+    now = time.monotonic()
+    if not model_load_attempted or now - _reload["checked_at"] < MODEL_RELOAD_INTERVAL:
+        return
+    _reload["checked_at"] = now
+    version = registry.current_version()
+    current = served.version if served else None
+    if version and version not in (current, _reload["failed"]) and _reload["loading"] is None:
+        with _model_lock:
+            if _reload["loading"] is None:
+                _reload["loading"] = version
+                threading.Thread(target=_load_new_version, args=(version,), name='model-reload',
+                                 daemon=True).start()
+
+@app.after_request
+def report_model_version(response):
+    pinned = g.get('served', served)
+    response.headers['X-Model-Version'] = pinned.version if pinned else "none"
+    return response
+
+# Server-Timing headers with the per-stage spans: on for every response with
+# SERVER_TIMING=1, otherwise per request with ?timing=1 or `X-Server-Timing: 1`
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+
+@app.before_request
+def start_worker_pools():
+    # Spawns the pool processes in each gunicorn worker, never in the
+    # --preload master, and without making this request wait for them.
+    # The job workers start here too, so jobs left queued by a restarted
+    # worker run without waiting for a new submission
+    cpu_executor.start()
+    job_queue.start()
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    g.spans = metrics.start_request()
+    g.outcome = {}
+
+def note_outcome(**fields):
+    """Add fields (result, error, ...) to this request's access log line"""
+    if has_request_context():
+        g.setdefault('outcome', {}).update(fields)
+
+def log_request(response, elapsed):
+    """One access line per request with the stage timings and the outcome"""
+    stages = {}
+    for name, seconds in g.spans:
+        stages[name] = round(stages.get(name, 0.0) + seconds * 1000, 2)
+    pinned = g.get('served', served)
+    access_logger.info("%s %s %s", request.method, request.path, response.status_code, extra={"fields": {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "stages_ms": stages,
+        "model_version": pinned.version if pinned else None,
+        "content_length": request.content_length,
+        **g.outcome,
+    }})
+
+@app.after_request
+def record_request_timing(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or "unknown"
+    metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if SERVER_TIMING or request.args.get("timing") == "1" or request.headers.get("X-Server-Timing") == "1":
+        response.headers['Server-Timing'] = metrics.server_timing(g.spans, total=elapsed)
+    if access_logger.isEnabledFor(logging.INFO):
+        log_request(response, elapsed)
+    return response
+
+def warm_up():
+    """Do the deferred imports, model load and first feature pass ahead of traffic"""
+    started = time.perf_counter()
+    try:
+        ensure_model()
+        timed('import_librosa_s', lambda: __import__('librosa'))
+        # Builds the cached mel filterbank and touches every code path once,
+        # including the batched one live scoring uses (and its kernels)
+        timed('first_features_s', lambda: extract_feature_vector(np.zeros(16000, dtype=np.float32)))
+        timed('first_feature_batch_s', lambda: extract_feature_batch(np.zeros((1, 16000), dtype=np.float32)))
+        # librosa/scipy (and the native libraries they bundle) are loaded now
+        cpu_executor.cap_loaded_libraries()
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+    STARTUP_TIMINGS['warm_up_s'] = round(time.perf_counter() - started, 4)
+    STARTUP_TIMINGS['ready_since_import_s'] = round(time.perf_counter() - APP_IMPORT_STARTED, 4)
+
+def load_predictor(model, model_path):
+    """
+    Prefer the compiled NumPy forest over sklearn's predict_proba: use the
+    exported arrays next to the .pkl if present, else compile at startup.
+    """
+    if model is None:
+        return None
+    try:
+        compiled_path = compiled_path_for(model_path)
+        if compiled_is_fresh(model_path):
+            compiled = load_compiled(compiled_path)
+            logger.info(f"✓ Compiled forest loaded from {compiled_path}")
+        else:
+            compiled = compile_model(model)
+            logger.info("✓ Forest compiled to NumPy arrays at startup")
+        return compiled
+    except Exception as e:
+        logger.error(f"Could not compile model, falling back to sklearn predict_proba: {e}")
+        return model
+
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('RESULT_CACHE_SIZE', 1024)),
+    disk_dir=os.environ.get('RESULT_CACHE_DIR') or None,
+    disk_max_entries=int(os.environ.get('RESULT_CACHE_DISK_MAX', 10000)),
+)
+metrics.REGISTRY.register(CallbackGauge(
+    'rolex_result_cache_hits_total', 'Result cache hits in memory', lambda: result_cache.hits, type='counter'))
+metrics.REGISTRY.register(CallbackGauge(
+    'rolex_result_cache_disk_hits_total', 'Result cache hits on disk', lambda: result_cache.disk_hits,
+    type='counter'))
+metrics.REGISTRY.register(CallbackGauge(
+    'rolex_result_cache_misses_total', 'Result cache misses', lambda: result_cache.misses, type='counter'))
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def file_format(filename):
+    return filename.rsplit('.', 1)[1].lower()
+
+def label_for(cls):
+    # Based on dataset.csv: 'real' and 'fake' are string labels
+    # train_model.py encodes: 'fake' = 0, 'real' = 1
+    return "Fake" if cls == 0 else "Real"
+
+def predict_features(features, served_model=None):
+    """
+    Run one vectorized predict_proba over an (N, 30) feature matrix.
+
+    Returns (predicted_classes, probabilities); predictions are derived from the
+    probabilities instead of paying for a separate model.predict call.
+    """
+    predictor = (served_model or ensure_model()).predictor
+    X = np.atleast_2d(features)
+    proba = predictor.predict_proba(X)
+    classes = predictor.classes_[np.argmax(proba, axis=1)]
+    return classes, proba
+
+def describe_prediction(proba, served_model=None):
+    """JSON-friendly verdict for one row of class probabilities"""
+    classes = (served_model or ensure_model()).classes_
+    return {
+        "result": label_for(classes[np.argmax(proba)]),
+        "confidence": float(np.max(proba) * 100),
+        "probabilities": {label_for(c): float(v) for c, v in zip(classes, proba)},
+    }
+
 def convert_to_wav(input_path):
     """Simplified - just return original path since we handle all formats directly"""
     return input_path
 
-def extract_features(filepath):
-    """Extract features matching the training format exactly"""
-    try:
-        logger.info(f"=== EXTRACT FEATURES DEBUG START ===")
-        logger.info(f"Processing file: {filepath}")
-        
-        # Check if file exists and is readable
-        if not os.path.exists(filepath):
-            logger.error(f"File does not exist: {filepath}")
-            return None
-            
-        file_size = os.path.getsize(filepath)
-        logger.info(f"File size: {file_size} bytes")
-        
-        if file_size == 0:
-            logger.error("File is empty")
-            return None
+def score_uploads(clips, served_model=None):
+    """
+    Featurize and score a list of (audio_bytes, fmt) uploads.
 
-        # ROBUST SOLUTION: Use FFmpeg directly to convert WebM to WAV
-        # This handles the WebM codec issue on Heroku more reliably
-        temp_wav_path = None
-        try:
-            # Check if file is WebM format
-            if filepath.lower().endswith('.webm'):
-                logger.info("WebM file detected, converting to WAV using FFmpeg...")
-                
-                # Create temporary WAV file path
-                temp_wav_path = filepath.replace('.webm', '_temp.wav')
-                
-                # Use FFmpeg directly to convert WebM to WAV
-                # FFmpeg is more reliable than pydub for WebM conversion on Heroku
-                import subprocess
-                ffmpeg_cmd = [
-                    'ffmpeg', '-i', filepath,
-                    '-acodec', 'pcm_s16le',  # 16-bit PCM
-                    '-ar', '16000',          # 16kHz sample rate
-                    '-ac', '1',              # Mono
-                    '-y',                    # Overwrite output file
-                    temp_wav_path
-                ]
-                
-                logger.info(f"Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
-                result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    logger.info(f"FFmpeg conversion successful: {temp_wav_path}")
-                    
-                    # Verify the WAV file was created and has content
-                    if os.path.exists(temp_wav_path) and os.path.getsize(temp_wav_path) > 0:
-                        logger.info(f"WAV file created successfully, size: {os.path.getsize(temp_wav_path)} bytes")
-                        
-                        # Use the converted WAV file for librosa
-                        y, sr = librosa.load(temp_wav_path, sr=16000)
-                        logger.info(f"SUCCESS: Audio loaded from converted WAV - {len(y)} samples at {sr}Hz")
-                    else:
-                        raise Exception("FFmpeg conversion failed - no output file created")
-                else:
-                    logger.error(f"FFmpeg failed with return code {result.returncode}")
-                    logger.error(f"FFmpeg stderr: {result.stderr}")
-                    raise Exception(f"FFmpeg conversion failed: {result.stderr}")
-            else:
-                # For non-WebM files, try direct loading with librosa
-                logger.info("Non-WebM file, trying direct librosa loading...")
-                y, sr = librosa.load(filepath, sr=16000)
-                logger.info(f"SUCCESS: Audio loaded directly - {len(y)} samples at {sr}Hz")
-                
-        except Exception as e:
-            logger.error(f"Primary loading method failed: {str(e)}")
-            logger.error(f"Exception type: {type(e).__name__}")
-            
-            # Fallback 1: Try pydub conversion if FFmpeg failed
-            if filepath.lower().endswith('.webm') and temp_wav_path:
-                try:
-                    logger.info("FFmpeg failed, trying pydub as fallback...")
-                    audio = AudioSegment.from_file(filepath, format="webm")
-                    audio.export(temp_wav_path, format="wav")
-                    logger.info(f"Pydub conversion successful: {temp_wav_path}")
-                    
-                    y, sr = librosa.load(temp_wav_path, sr=16000)
-                    logger.info(f"SUCCESS: Audio loaded from pydub-converted WAV - {len(y)} samples at {sr}Hz")
-                except Exception as e_pydub:
-                    logger.error(f"Pydub fallback also failed: {str(e_pydub)}")
-                    
-                    # Fallback 2: Try direct librosa loading without resampling
-                    try:
-                        logger.info("Trying final fallback: direct librosa loading without resampling...")
-                        y, sr = librosa.load(filepath, sr=None)
-                        logger.info(f"Loaded at original rate: {len(y)} samples at {sr}Hz")
-                        
-                        # Resample to 16kHz if needed
-                        if sr != 16000:
-                            logger.info(f"Resampling from {sr}Hz to 16000Hz")
-                            y = librosa.resample(y, orig_sr=sr, target_sr=16000)
-                            sr = 16000
-                            logger.info(f"Resampled: {len(y)} samples at {sr}Hz")
-                    except Exception as e2:
-                        logger.error(f"All loading methods failed: {str(e2)}")
-                        logger.error(f"Exception type: {type(e2).__name__}")
-                        return None
+    Uploads already in the result cache skip decoding and feature extraction;
+    the rest are featurized in parallel and scored with one predict_proba call.
+    Returns a list of (features, proba) tuples, None for clips that failed.
+    """
+    served_model = served_model or ensure_model()
+    results = [None] * len(clips)
+    misses = []
+    with span('cache_lookup'):
+        keys = [content_key(audio_bytes, served_model.version) for audio_bytes, _ in clips]
+        for i, key in enumerate(keys):
+            cached = result_cache.get(key)
+            if cached is not None:
+                logger.debug("Result cache hit for upload %d", i)
+                results[i] = cached
             else:
-                # For non-WebM files, try loading without resampling
-                try:
-                    logger.info("Trying fallback: loading without resampling...")
-                    y, sr = librosa.load(filepath, sr=None)
-                    logger.info(f"Loaded at original rate: {len(y)} samples at {sr}Hz")
-                    
-                    # Resample to 16kHz if needed
-                    if sr != 16000:
-                        logger.info(f"Resampling from {sr}Hz to 16000Hz")
-                        y = librosa.resample(y, orig_sr=sr, target_sr=16000)
-                        sr = 16000
-                        logger.info(f"Resampled: {len(y)} samples at {sr}Hz")
-                except Exception as e2:
-                    logger.error(f"All loading methods failed: {str(e2)}")
-                    logger.error(f"Exception type: {type(e2).__name__}")
-                    return None
-        finally:
-            # Clean up temporary WAV file if created
-            if temp_wav_path and os.path.exists(temp_wav_path):
-                try:
-                    os.remove(temp_wav_path)
-                    logger.info(f"Cleaned up temporary file: {temp_wav_path}")
-                except:
-                    pass
-        
-        if len(y) == 0:
-            logger.error("Audio file is empty or corrupted")
-            return None
-            
-        logger.info(f"Audio successfully loaded: {len(y)} samples at {sr} Hz")
-        
-        # Extract features exactly like training script
-        try:
-            logger.info("Starting feature extraction...")
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            logger.info(f"MFCC extracted: shape {mfcc.shape}")
-            zcr = librosa.feature.zero_crossing_rate(y)
-            logger.info(f"ZCR extracted: shape {zcr.shape}")
-            spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)
-            logger.info(f"Spectral centroid extracted: shape {spec_cent.shape}")
-        except Exception as e:
-            logger.error(f"Error extracting audio features: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return None
-
-        # Combine features in same order as training
-        features = np.hstack([
-            np.mean(mfcc, axis=1),     # mfcc_mean_0 to mfcc_mean_12 (13 features)
-            np.std(mfcc, axis=1),      # mfcc_std_0 to mfcc_std_12 (13 features)
-            np.mean(zcr),              # zcr_mean (1 feature)
-            np.std(zcr),               # zcr_std (1 feature)
-            np.mean(spec_cent),        # spec_cent_mean (1 feature)
-            np.std(spec_cent)          # spec_cent_std (1 feature)
-        ])
-        
-        logger.info(f"SUCCESS: Extracted features shape: {features.shape} (expected: 30)")
-        logger.info(f"=== EXTRACT FEATURES DEBUG END - SUCCESS ===")
-        return features
-        
-    except Exception as e:
-        logger.error(f"=== EXTRACT FEATURES DEBUG END - ERROR ===")
-        logger.error(f"Error extracting features from {filepath}: {e}")
-        logger.error(f"Exception type: {type(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+                misses.append(i)
+
+    features = cpu_executor.run_all([(extract_features, clips[i]) for i in misses])
+
+    scored = [(i, vector) for i, vector in zip(misses, features) if vector is not None]
+    if scored:
+        with span('predict'):
+            _, proba = predict_features(np.vstack([vector for _, vector in scored]), served_model)
+        for (i, vector), p in zip(scored, proba):
+            results[i] = (vector, p)
+            result_cache.put(keys[i], vector, p, prefix=prefix_key(clips[i][0], served_model.version))
+    return results
+
+def receive_upload(field="file", keep=False):
+    """
+    The `field` file part of this request, read as it arrives rather than
+    through request.files (see upload_stream.py), or None if there is none
+    """
+    try:
+        return open_upload(request.stream, request.content_type, field, keep=keep)
+    except UploadError as e:
+        logger.info("Malformed upload: %s", e)
+        return None
+
+def decode_upload(upload, fmt):
+    """
+    16 kHz float32 PCM of a StreamedUpload (opened with keep=True), decoded
+    while it is still arriving. If the streaming decoder fails, pydub and
+    librosa get the complete upload. Raises DecodeError, AudioTooLong, or
+    whatever stopped the upload itself (e.g. RequestEntityTooLarge).
+    """
+    decoder, blocks = iter_decode_upload(upload.chunks(), fmt, sr=16000)
+    failure = None
+    try:
+        with span('upload_decode'):
+            pcm = list(limit_duration(blocks, MAX_AUDIO_SECONDS, 16000))
+    except DecodeError as e:
+        pcm, failure = [], e
+    finally:
+        # Stops ffmpeg when decoding was cut short
+        blocks.close()
+    if upload.error is not None:
+        raise upload.error
+    if pcm:
+        DECODES.inc(decoder=decoder, outcome='ok')
+        return np.concatenate(pcm)
+
+    DECODES.inc(decoder=decoder, outcome='error' if failure else 'empty')
+    logger.warning("Streaming %s decode failed (%s), trying the other decoders", decoder, failure or "no samples")
+    y, _ = decode_audio(upload.read(), fmt, sr=16000, skip=(decoder,))
+    if len(y) > MAX_AUDIO_SECONDS * 16000:
+        raise AudioTooLong(f"Audio is longer than {MAX_AUDIO_SECONDS:g} seconds")
+    return y
+
+def decode_buffered_upload(upload, fmt):
+    """16 kHz float32 PCM of a StreamedUpload (opened with keep=True) that has been read in full"""
+    y, _ = decode_audio(upload.read(), fmt, sr=16000)
+    if len(y) > MAX_AUDIO_SECONDS * 16000:
+        raise AudioTooLong(f"Audio is longer than {MAX_AUDIO_SECONDS:g} seconds")
+    return y
+
+def score_streamed_upload(upload, served_model):
+    """
+    Featurize and score a streamed upload. If its first PREFIX_BYTES match
+    an upload scored before (or it is no bigger than that), the rest is read
+    and the result cache consulted before anything is decoded; otherwise
+    decoding overlaps the upload itself and the cache is checked once the
+    last byte (and so the content hash) is in. Returns (features, proba),
+    or None if the upload could not be decoded or featurized.
+    """
+    fmt = file_format(upload.filename)
+    prefix = prefix_key(upload.head(PREFIX_BYTES), served_model.version)
+    buffered = upload.complete or result_cache.seen_prefix(prefix)
+    if buffered:
+        with span('read'):
+            upload.finish()
+        key = content_key(None, served_model.version, digest=upload.hexdigest())
+        with span('cache_lookup'):
+            cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        y = decode_buffered_upload(upload, fmt) if buffered else decode_upload(upload, fmt)
+    except DecodeError as e:
+        logger.error("All loading methods failed: %s", e)
+        ERRORS.inc(stage='decode')
         return None
 
+    if not buffered:
+        key = content_key(None, served_model.version, digest=upload.hexdigest())
+        with span('cache_lookup'):
+            cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        with span('features'):
+            features = cpu_executor.run(extract_feature_vector, y, 16000)
+    except Exception:
+        ERRORS.inc(stage='features')
+        logger.exception("Error extracting audio features")
+        return None
+    with span('predict'):
+        _, proba = predict_features(features, served_model)
+    result_cache.put(key, features, proba[0], prefix=prefix)
+    return features, proba[0]
+
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(AudioTooLong)
+def upload_too_large(e):
+    if isinstance(e, AudioTooLong):
+        message = f"Recording is too long (max {MAX_AUDIO_SECONDS:g} seconds)"
+    else:
+        message = f"Upload is too large (max {MAX_UPLOAD_MB:g} MB)"
+    note_outcome(error=message)
+    if request.path.startswith("/api/"):
+        return jsonify({"error": message}), 413
+    flash(message + ".", "error")
+    return render_template("index.html"), 413
+
+def admission_controlled(view):
+    """
+    Run a prediction view only once admission control grants a slot. The
+    slot is held until the response has been sent, so streamed (NDJSON)
+    responses count for as long as they are producing windows.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "POST":
+            return view(*args, **kwargs)
+        upstream = upstream_queue_seconds(request.headers.get("X-Request-Start")) \
+            if ADMISSION_TRUST_REQUEST_START else 0.0
+        queued = admission.acquire(upstream)
+        note_outcome(queue_ms=round(queued * 1000, 2))
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            admission.release()
+            raise
+        response.call_on_close(admission.release)
+        return response
+    return wrapper
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    note_outcome(error="shed", shed_reason=e.reason)
+    message = "Server is busy, please retry shortly."
+    if request.path.startswith("/api/"):
+        response = jsonify({"error": message})
+    else:
+        flash(message, "error")
+        response = app.make_response(render_template("index.html"))
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
 @app.route("/", methods=["GET", "POST"])
+@admission_controlled
 def index():
     if request.method == "POST":
         # Check if model is loaded
-        if model is None:
+        served_model = ensure_model()
+        if served_model is None:
             flash("Model not available. Please try again later.", "error")
             logger.error("Model not available")
             return render_template("index.html")
         
+        # The upload is read straight off the request body as it arrives
+        file = receive_upload("file", keep=True)
+
         # Check if file was uploaded
-        if 'file' not in request.files:
+        if file is None:
             flash("No file uploaded. Please select an audio file.", "error")
             return render_template("index.html")
         
-        file = request.files["file"]
-        
         # Check if file is selected
         if file.filename == '':
             flash("No file selected. Please choose an audio file.", "error")
@@ -275,122 +606,427 @@ def index():
             return render_template("index.html")
         
         try:
-            # Save uploaded file
-            filename = str(uuid.uuid4()) + "_" + file.filename
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
+            # Decode while the upload streams in, then extract features and
+            # predict (served from cache on repeats)
+            scored = score_streamed_upload(file, served_model)
+            logger.debug("Upload %s (%s): %d bytes", file.filename, file.content_type, file.size)
             
-            logger.info(f"=== FILE UPLOAD DEBUG ===")
-            logger.info(f"Original filename: {file.filename}")
-            logger.info(f"File content type: {file.content_type}")
-            logger.info(f"Saved as: {filename}")
-            logger.info(f"Full path: {filepath}")
-            logger.info(f"File uploaded: {filename}, size: {os.path.getsize(filepath)} bytes")
-            
-            # Extract features
-            features = extract_features(filepath)
-            
-            if features is None:
+            if scored is None:
                 flash("Error processing audio file. Please try a different file.", "error")
-                logger.error("Feature extraction failed")
-                # Clean up uploaded file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+                note_outcome(error="feature extraction failed")
                 return render_template("index.html")
             
-            # Make prediction
-            features_reshaped = features.reshape(1, -1)
-            prediction = model.predict(features_reshaped)[0]
-            confidence = model.predict_proba(features_reshaped)[0]
-            
-            # Get result - check training data to confirm label mapping
-            # Based on dataset.csv: 'real' and 'fake' are string labels
-            # Model likely encodes: 'fake' = 0, 'real' = 1 (alphabetical order)
-            result = "Fake" if prediction == 0 else "Real"
-            confidence_score = max(confidence) * 100
+            _, proba = scored
+            result = label_for(served_model.classes_[np.argmax(proba)])
+            confidence_score = max(proba) * 100
             
-            logger.info(f"=== PREDICTION SUCCESS ===")
-            logger.info(f"Prediction: {result}, Confidence: {confidence_score}%")
+            note_outcome(result=result, confidence=round(float(confidence_score), 2))
             
-            # Clean up uploaded file
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
-            return render_template("index.html", 
-                                 result=result, 
-                                 confidence=confidence_score,
-                                 filename=file.filename)
+            with span('render'):
+                return render_template("index.html", 
+                                     result=result, 
+                                     confidence=confidence_score,
+                                     filename=file.filename)
                                  
+        except (HTTPException, AudioTooLong):
+            raise
         except Exception as e:
-            logger.error(f"Error processing file: {e}")
-            logger.error(f"Exception type: {type(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            ERRORS.inc(stage='request')
+            logger.exception("Error processing file")
+            note_outcome(error=type(e).__name__)
             flash("Error processing audio file. Please try again.", "error")
-            # Clean up uploaded file
-            if 'filepath' in locals() and os.path.exists(filepath):
-                os.remove(filepath)
             return render_template("index.html")
     
     return render_template("index.html")
 
-# Health check endpoint for Heroku
-@app.route("/health")
-def health_check():
-    """Comprehensive health check endpoint for Heroku"""
-    import sys
-    
-    # Test system dependencies
-    ffmpeg_available = os.system("which ffmpeg > /dev/null 2>&1") == 0
-    
-    # Test audio libraries
-    librosa_test = False
-    soundfile_test = False
-    pydub_test = False
-    
+@app.route("/api/predict/batch", methods=["POST"])
+@admission_controlled
+def predict_batch():
+    """Score many clips in one request with a single vectorized predict_proba"""
+    if ensure_model() is None:
+        return jsonify({"error": "Model not available"}), 503
+
+    files = request.files.getlist("files") or request.files.getlist("file")
+    if not files:
+        return jsonify({"error": "No files uploaded. Send one or more 'files' parts."}), 400
+    if len(files) > BATCH_MAX_FILES:
+        return jsonify({"error": f"Too many files: {len(files)} (max {BATCH_MAX_FILES})"}), 413
+
+    results = [None] * len(files)
+    pending = []
+    for i, file in enumerate(files):
+        if not file.filename or not allowed_file(file.filename):
+            results[i] = {"filename": file.filename, "error": "Invalid file type"}
+        else:
+            pending.append((i, file.filename, file.read(), file_format(file.filename)))
+
+    logger.debug("Batch request: %d files, %d accepted", len(files), len(pending))
+
+    # Decode and featurize in parallel, cached uploads skip straight to results
+    scored_clips = score_uploads([(audio_bytes, fmt) for _, _, audio_bytes, fmt in pending])
+
+    scored = []
+    for (i, filename, _, _), scored_clip in zip(pending, scored_clips):
+        if scored_clip is None:
+            results[i] = {"filename": filename, "error": "Error processing audio file"}
+        else:
+            scored.append((i, filename, scored_clip[1]))
+
+    aggregate = None
+    if scored:
+        proba = np.vstack([p for _, _, p in scored])
+        classes = ensure_model().classes_[np.argmax(proba, axis=1)]
+        for i, filename, p in scored:
+            results[i] = {"filename": filename, **describe_prediction(p)}
+
+        # Aggregate verdict: average the per-clip probabilities
+        aggregate = {
+            **describe_prediction(proba.mean(axis=0)),
+            "votes": {label: int(sum(label_for(c) == label for c in classes)) for label in ("Real", "Fake")},
+            "clips_scored": len(scored),
+        }
+    note_outcome(clips=len(files), clips_scored=len(scored), result=aggregate["result"] if aggregate else None)
+
+    return jsonify({
+        "results": results,
+        "aggregate": aggregate,
+        "clips_received": len(files),
+    }), (200 if scored else 422)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Stage and request latency histograms, decode/error counters and cache
+    counters in Prometheus text format. Values are per worker process.
+    """
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Result cache hit/miss counters"""
+    return jsonify({"model_version": served.version if served else "none", **result_cache.stats()})
+
+def describe_verdict(verdict, served_model=None):
+    """JSON-friendly running verdict for sliding-window scoring"""
+    if not verdict.windows:
+        return {"result": None, "windows_scored": 0, "windows_skipped": verdict.skipped}
+    return {
+        **describe_prediction(verdict.mean_proba, served_model),
+        "votes": {label_for(c): int(v) for c, v in zip(verdict.classes, verdict.votes)},
+        "windows_scored": verdict.windows,
+        "windows_skipped": verdict.skipped,
+    }
+
+@app.route("/api/predict/stream", methods=["POST"])
+@admission_controlled
+def predict_stream():
+    """
+    Score an upload in 2 second sliding windows, like the training chunks.
+
+    Query/form params: `window` and `hop` in seconds (default 2.0 each).
+    With `stream=1` the response is NDJSON: one line per window as it is
+    scored, followed by a final verdict line. The upload is decoded as it
+    arrives, so the first windows are scored before it has finished.
+    """
+    served_model = ensure_model()
+    if served_model is None:
+        return jsonify({"error": "Model not available"}), 503
+
+    # Windows are scored while the rest of the upload is still arriving;
+    # form fields are only seen if they come before the file part
+    file = receive_upload("file")
+    if file is None or file.filename == '':
+        return jsonify({"error": "No file uploaded. Send the audio as a 'file' part."}), 400
+    if not allowed_file(file.filename):
+        return jsonify({"error": "Invalid file type. Please upload WAV, MP3, M4A, FLAC, OGG, or WebM files."}), 400
+    values = {**file.form, **request.args}
+
     try:
-        import librosa
-        # Test basic librosa functionality
-        test_audio = librosa.tone(440, sr=16000, duration=0.1)
-        mfcc_test = librosa.feature.mfcc(y=test_audio, sr=16000, n_mfcc=13)
-        librosa_test = True
-    except Exception as e:
-        logger.error(f"Librosa test failed: {e}")
-    
+        window_seconds = float(values.get("window", WINDOW_SECONDS))
+        hop_seconds = float(values.get("hop", HOP_SECONDS))
+    except ValueError:
+        return jsonify({"error": "'window' and 'hop' must be numbers of seconds"}), 400
+    if not (0.1 <= window_seconds <= 30 and 0.1 <= hop_seconds <= 30):
+        return jsonify({"error": "'window' and 'hop' must be between 0.1 and 30 seconds"}), 400
+
+    fmt = file_format(file.filename)
+    filename = file.filename
+
+    def windows():
+        _, blocks = iter_decode_upload(file.chunks(), fmt, sr=16000)
+        return score_windows(limit_duration(blocks, MAX_AUDIO_SECONDS, 16000), served_model.predictor.predict_proba,
+                             served_model.classes_, sr=16000, window_seconds=window_seconds, hop_seconds=hop_seconds,
+                             featurize=lambda y, sr: cpu_executor.run(extract_feature_vector, y, sr))
+
+    if values.get("stream") in ("1", "true"):
+        def generate():
+            verdict = None
+            try:
+                for start, end, proba, verdict in windows():
+                    yield json.dumps({"start": start, "end": end, **describe_prediction(proba, served_model),
+                                      "running": describe_verdict(verdict, served_model)}) + "\n"
+                if file.error is not None:
+                    raise file.error
+            except (DecodeError, AudioTooLong, UploadError, RequestEntityTooLarge) as e:
+                # Headers are long gone; report the failure in-band
+                error = file.error or e
+                logger.error("Streaming decode failed: %s", error)
+                message = str(error) if isinstance(error, (AudioTooLong, RequestEntityTooLarge)) \
+                    else "Error processing audio file"
+                yield json.dumps({"error": message}) + "\n"
+                return
+            final = describe_verdict(verdict, served_model) if verdict else {"result": None, "windows_scored": 0}
+            yield json.dumps({"filename": filename, "final": final,
+                              "model_version": served_model.version}) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    results = []
+    verdict = None
     try:
-        import soundfile as sf
-        # Test if soundfile can work
-        soundfile_test = True
-    except Exception as e:
-        logger.error(f"Soundfile test failed: {e}")
-    
+        for start, end, proba, verdict in windows():
+            results.append({"start": start, "end": end, **describe_prediction(proba)})
+        if file.error is not None:
+            raise file.error
+    except (DecodeError, UploadError) as e:
+        error = file.error or e
+        if isinstance(error, HTTPException):
+            raise error
+        logger.error("Streaming decode failed: %s", error)
+        return jsonify({"error": "Error processing audio file"}), 422
+
+    return jsonify({
+        "filename": filename,
+        "windows": results,
+        "verdict": describe_verdict(verdict) if verdict else {"result": None, "windows_scored": 0},
+    })
+
+# Longest rolling buffer a live client may post in one request
+LIVE_MAX_SECONDS = float(os.environ.get('LIVE_MAX_SECONDS', 10))
+LIVE_PCM_DTYPES = {'float32': '<f4', 'int16': '<i2'}
+
+@app.route("/api/live/score", methods=["POST"])
+@admission_controlled
+def live_score():
+    """
+    Low-latency scoring for live microphone input.
+
+    The client keeps a rolling buffer of the most recent audio and posts it as
+    raw little-endian PCM (mono) every hop; the body is scored in 2 second
+    windows straight from memory, with no container decoding or ffmpeg.
+    Query params: `sr` (default 16000) and `dtype` (`float32` or `int16`).
+    Each request is self-contained, so any gunicorn worker can serve it.
+    """
+    started = time.perf_counter()
+    served_model = ensure_model()
+    if served_model is None:
+        return jsonify({"error": "Model not available"}), 503
+
     try:
-        from pydub import AudioSegment
-        # Test basic pydub functionality
-        test_audio = AudioSegment.silent(duration=100)  # 100ms of silence
-        pydub_test = True
-    except Exception as e:
-        logger.error(f"Pydub test failed: {e}")
-    
-    overall_status = "healthy" if all([model is not None, ffmpeg_available, librosa_test, soundfile_test, pydub_test]) else "degraded"
-    
+        sr = int(request.args.get("sr", 16000))
+    except ValueError:
+        return jsonify({"error": "'sr' must be an integer sample rate"}), 400
+    dtype = LIVE_PCM_DTYPES.get(request.args.get("dtype", "float32"))
+    if dtype is None or not 8000 <= sr <= 192000:
+        return jsonify({"error": "Unsupported PCM format; use dtype=float32|int16 and 8000 <= sr <= 192000"}), 400
+
+    itemsize = np.dtype(dtype).itemsize
+    max_bytes = LIVE_MAX_SECONDS * sr * itemsize
+    too_long = f"Send at most {LIVE_MAX_SECONDS:g} seconds of audio per request"
+    # Refuse an oversized body before reading it when its Content-Length says
+    # so; chunked bodies (no Content-Length) are checked once read
+    if (request.content_length or 0) > max_bytes:
+        return jsonify({"error": too_long}), 413
+    body = request.get_data(cache=False)
+    if len(body) > max_bytes:
+        return jsonify({"error": too_long}), 413
+    if not body or len(body) % itemsize:
+        return jsonify({"error": "Body must be whole raw PCM samples"}), 400
+
+    # float32 bodies are used in place (no copy); 16 kHz skips resampling
+    with span('decode'):
+        if dtype == '<i2':
+            y = pcm16_to_float32(body)
+        else:
+            y = np.frombuffer(body, dtype=dtype).astype(np.float32, copy=False)
+            if not np.isfinite(y).all():
+                return jsonify({"error": "PCM samples must be finite (no NaN or Inf)"}), 400
+        y = resample(y, sr, 16000)
+
+    # The whole buffer is in memory, so its windows are featurized as one batch
+    with span('score'):
+        scored, verdict = score_buffer(y, served_model.predictor.predict_proba, served_model.classes_, sr=16000,
+                                       featurize_batch=lambda X, sr: cpu_executor.run(extract_feature_batch, X, sr))
+    windows = [{"start": start, "end": end, **describe_prediction(proba)} for start, end, proba in scored]
+    note_outcome(windows=len(windows), audio_seconds=round(len(y) / 16000, 2))
+
+    return jsonify({
+        "windows": windows,
+        "verdict": describe_verdict(verdict),
+        "audio_seconds": len(y) / 16000,
+        "server_ms": (time.perf_counter() - started) * 1000,
+    })
+
+def run_job(audio_bytes, fmt):
+    """Job queue worker: featurize and score one queued upload"""
+    served_model = ensure_model()
+    if served_model is None:
+        raise RuntimeError("Model not available")
+    scored = score_uploads([(audio_bytes, fmt)], served_model)[0]
+    if scored is None:
+        raise RuntimeError("Error processing audio file")
+    return {**describe_prediction(scored[1], served_model), "model_version": served_model.version}
+
+# Submit/poll mode for long uploads; the queue is a SQLite file shared by all
+# gunicorn workers so any worker can answer a poll
+job_queue = JobQueue(
+    run_job,
+    db_path=os.environ.get('JOB_DB_PATH') or None,
+    concurrency=int(os.environ.get('JOB_CONCURRENCY', 1)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 16)),
+    result_ttl=int(os.environ.get('JOB_RESULT_TTL', 3600)),
+)
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """Queue an upload for background processing and return its job id"""
+    if ensure_model() is None:
+        return jsonify({"error": "Model not available"}), 503
+
+    file = request.files.get("file")
+    if file is None or file.filename == '':
+        return jsonify({"error": "No file uploaded. Send the audio as a 'file' part."}), 400
+    if not allowed_file(file.filename):
+        return jsonify({"error": "Invalid file type. Please upload WAV, MP3, M4A, FLAC, OGG, or WebM files."}), 400
+
+    try:
+        job_id = job_queue.submit(file.read(), file_format(file.filename), file.filename)
+    except QueueFull as e:
+        logger.info("Rejecting job: %s", e)
+        note_outcome(error="queue full")
+        response = jsonify({"error": "Job queue is full, please retry later."})
+        response.headers["Retry-After"] = "5"
+        return response, 429
+
     return jsonify({
-        "status": overall_status,
-        "model_loaded": model is not None,
-        "upload_folder": os.path.exists(UPLOAD_FOLDER),
+        "job_id": job_id,
+        "status": "queued",
+        "poll_url": url_for("get_job", job_id=job_id),
+    }), 202
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """Status and, once finished, the result of a queued job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    return jsonify(job)
+
+# Decoder availability is resolved once; probes never fork a `which`
+FFMPEG_PATH = shutil.which('ffmpeg')
+
+# Expensive dependency checks are cached for this many seconds
+HEALTH_DEEP_TTL = float(os.environ.get('HEALTH_DEEP_TTL', 60))
+_deep_health = {"checked_at": None, "report": None}
+_deep_health_lock = threading.Lock()
+
+def pipeline_readiness():
+    """Readiness of the prediction pipeline from state cached at startup"""
+    return {
+        "model_loaded": served is not None,
+        "model_load_attempted": model_load_attempted,
+        "model_version": served.version if served else "none",
+        "model_trained_at": served.metadata.get('trained_at') if served else None,
+        "decoder_available": FFMPEG_PATH is not None,
+        "admission": admission.stats(),
+        "cpu_executor": cpu_executor.stats(),
+    }
+
+def tone_wav(seconds=0.5, sr=16000):
+    """A short 440 Hz test tone as WAV bytes"""
+    t = np.arange(int(seconds * sr)) / sr
+    samples = (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+def run_deep_checks():
+    """Exercise every stage of the pipeline once: decode, features, prediction"""
+    checks = {}
+
+    def check(name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+            checks[name] = {"ok": True}
+        except Exception as e:
+            logger.error(f"Deep health check '{name}' failed: {e}")
+            checks[name] = {"ok": False, "error": str(e)}
+        checks[name]["seconds"] = round(time.perf_counter() - started, 4)
+
+    wav = tone_wav()
+    decoded = {}
+    check("ffmpeg_decode", lambda: decoded.setdefault("y", decode_with_ffmpeg(wav, 'wav')))
+    check("soundfile", lambda: __import__('soundfile'))
+    check("pydub", lambda: __import__('pydub').AudioSegment.silent(duration=100))
+    features = {}
+    check("features", lambda: features.setdefault(
+        "x", extract_feature_vector(decoded.get("y", np.zeros(8000, dtype=np.float32)))))
+    if ensure_model() is not None and "x" in features:
+        check("prediction", lambda: predict_features(features["x"]))
+    else:
+        checks["prediction"] = {"ok": False, "error": "Model not available"}
+
+    return {
+        "status": "healthy" if all(c["ok"] for c in checks.values()) else "degraded",
+        "checks": checks,
         "system_dependencies": {
-            "ffmpeg": ffmpeg_available,
+            "ffmpeg": FFMPEG_PATH,
             "python_version": sys.version
         },
-        "audio_libraries": {
-            "librosa": librosa_test,
-            "soundfile": soundfile_test,
-            "pydub": pydub_test
-        },
         "environment": {
             "platform": sys.platform,
             "working_directory": os.getcwd()
         }
+    }
+
+# Health check endpoint for Heroku and load balancer probes
+@app.route("/health")
+def health_check():
+    """Constant-time liveness check: reports cached state, does no work"""
+    readiness = pipeline_readiness()
+    if readiness["model_loaded"] and readiness["decoder_available"]:
+        status = "healthy"
+    elif not model_load_attempted:
+        status = "starting"
+    else:
+        status = "degraded"
+    return jsonify({
+        "status": status,
+        **readiness,
+        "startup_mode": STARTUP_MODE,
+        "startup_timings": STARTUP_TIMINGS,
+    })
+
+@app.route("/health/deep")
+def deep_health_check():
+    """Full dependency and pipeline check, cached for HEALTH_DEEP_TTL seconds"""
+    with _deep_health_lock:
+        # Concurrent probes wait for one run instead of each doing the work
+        checked_at = _deep_health["checked_at"]
+        if checked_at is None or time.monotonic() - checked_at > HEALTH_DEEP_TTL:
+            _deep_health["report"] = run_deep_checks()
+            _deep_health["checked_at"] = checked_at = time.monotonic()
+        report = _deep_health["report"]
+
+    return jsonify({
+        **report,
+        **pipeline_readiness(),
+        "cached_age_s": round(time.monotonic() - checked_at, 3),
+        "ttl_s": HEALTH_DEEP_TTL,
     })
 
 @app.route("/test-webm")
@@ -447,6 +1083,19 @@ def test_webm():
             "error": str(e)
         })
 
+# Everything above is cheap to import; the model and librosa load here
+# according to STARTUP_MODE
+STARTUP_TIMINGS['app_import_s'] = round(time.perf_counter() - APP_IMPORT_STARTED, 4)
+
+if STARTUP_MODE == 'eager':
+    warm_up()
+    # Under gunicorn --preload the workers fork after this point; moving
+    # everything loaded so far out of the GC's reach stops collections from
+    # writing to (and so un-sharing) those pages in every worker
+    gc.freeze()
+elif STARTUP_MODE == 'background':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
 if __name__ == "__main__":
     # For local development
     app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
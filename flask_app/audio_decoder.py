@@ -0,0 +1,387 @@
+"""
+In-memory audio decoding for uploads.
+
+Uploads are streamed into ffmpeg's stdin and 16 kHz mono float32 PCM is read
+straight back from its stdout, so no intermediate WAV files ever hit disk.
+
+Audio that is already 16-bit mono PCM WAV at the target rate (the training
+chunks, most browser/CLI test clips) is read directly without ffmpeg or any
+resampling. Everything stays float32 end to end; where this module resamples
+itself it uses a float32 polyphase filter.
+"""
+import io
+import os
+import math
+import wave
+import struct
+import itertools
+import functools
+import subprocess
+import threading
+import logging
+
+import numpy as np
+
+from metrics import DECODES, span
+
+logger = logging.getLogger(__name__)
+
+TARGET_SR = 16000
+
+# MP4-family containers often put the 'moov' atom at the end of the file, which
+# ffmpeg cannot reach on a non-seekable pipe. For those we hand ffmpeg an
+# anonymous in-memory file (memfd) instead, which is seekable but never touches
+# the filesystem.
+SEEKABLE_INPUT_FORMATS = {'m4a', 'mp4', 'mov'}
+
+
+class DecodeError(Exception):
+    """Raised when none of the decoders could turn the upload into PCM"""
+
+
+def _ffmpeg_cmd(input_url, sr):
+    return [
+        'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-i', input_url,
+        '-vn',
+        '-f', 'f32le',           # raw little-endian float32 PCM
+        '-acodec', 'pcm_f32le',
+        '-ar', str(sr),          # 16kHz sample rate
+        '-ac', '1',              # Mono
+        'pipe:1'
+    ]
+
+
+def _pcm_from_stdout(stdout):
+    # np.frombuffer is zero-copy over the bytes object ffmpeg gave us
+    return np.frombuffer(stdout, dtype='<f4')
+
+
+def _decode_ffmpeg_pipe(data, sr):
+    """Pipe the raw upload into ffmpeg and read float32 PCM from stdout"""
+    result = subprocess.run(_ffmpeg_cmd('pipe:0', sr), input=data, capture_output=True)
+    if result.returncode != 0:
+        raise DecodeError(f"ffmpeg pipe decode failed: {result.stderr.decode(errors='replace').strip()}")
+    return _pcm_from_stdout(result.stdout)
+
+
+def _decode_ffmpeg_memfd(data, sr):
+    """Decode via a seekable anonymous memory file, for containers that need seeking"""
+    fd = os.memfd_create('rolex-upload', 0)
+    try:
+        with os.fdopen(os.dup(fd), 'wb') as f:
+            f.write(data)
+        os.lseek(fd, 0, os.SEEK_SET)
+        result = subprocess.run(
+            _ffmpeg_cmd(f'/proc/self/fd/{fd}', sr),
+            capture_output=True,
+            pass_fds=(fd,),
+        )
+    finally:
+        os.close(fd)
+    if result.returncode != 0:
+        raise DecodeError(f"ffmpeg memfd decode failed: {result.stderr.decode(errors='replace').strip()}")
+    return _pcm_from_stdout(result.stdout)
+
+
+def decode_with_ffmpeg(data, fmt=None, sr=TARGET_SR):
+    """Decode upload bytes with ffmpeg without creating any temp files"""
+    if fmt in SEEKABLE_INPUT_FORMATS and hasattr(os, 'memfd_create'):
+        try:
+            return _decode_ffmpeg_memfd(data, sr)
+        except (DecodeError, OSError) as e:
+            logger.debug("memfd decode failed (%s), retrying over a plain pipe", e)
+    return _decode_ffmpeg_pipe(data, sr)
+
+
+def _feed_stdin(proc, chunks):
+    try:
+        for chunk in chunks:
+            proc.stdin.write(chunk)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early; the error is reported from its return code
+        pass
+    except Exception as e:
+        # The chunk source failed (e.g. an upload over the size cap); it
+        # reports that itself, ffmpeg just sees the input end here
+        logger.debug("Upload stream ended with an error: %s", e)
+    finally:
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+
+
+def _stream_pcm(proc, block_samples, cleanup=()):
+    """Yield float32 blocks from a running ffmpeg's stdout, then reap it"""
+    # Drain stderr concurrently so a chatty ffmpeg can't block on a full pipe
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    block_bytes = block_samples * 4
+    drained = False
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                drained = True
+                break
+            # Keep whole float32 samples; a short read is topped up below
+            remainder = len(data) % 4
+            if remainder:
+                data += proc.stdout.read(4 - remainder)
+            yield np.frombuffer(data, dtype='<f4')
+    finally:
+        if not drained:
+            # The consumer stopped early (or failed); don't wait for ffmpeg to finish
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        stderr_reader.join()
+        for fn in cleanup:
+            fn()
+
+    if returncode != 0:
+        stderr = b''.join(stderr_chunks).decode(errors='replace').strip()
+        raise DecodeError(f"ffmpeg stream decode failed: {stderr}")
+
+
+def iter_decode_ffmpeg(chunks, fmt=None, sr=TARGET_SR, block_samples=TARGET_SR):
+    """
+    Incrementally decode an iterable of upload byte chunks with ffmpeg.
+
+    Yields float32 PCM blocks of up to `block_samples` as ffmpeg produces them,
+    so the whole recording is never held as PCM at once. Raises DecodeError if
+    ffmpeg fails.
+    """
+    fmt = fmt.lower() if fmt else None
+    if fmt in SEEKABLE_INPUT_FORMATS and hasattr(os, 'memfd_create'):
+        # Containers that need seeking are spooled into an anonymous memory file
+        memfd = os.memfd_create('rolex-upload', 0)
+        try:
+            with os.fdopen(os.dup(memfd), 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.lseek(memfd, 0, os.SEEK_SET)
+            proc = subprocess.Popen(
+                _ffmpeg_cmd(f'/proc/self/fd/{memfd}', sr),
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                pass_fds=(memfd,),
+            )
+        except BaseException:
+            # The upload failed mid-spool or ffmpeg could not start
+            os.close(memfd)
+            raise
+        return _stream_pcm(proc, block_samples, cleanup=[lambda: os.close(memfd)])
+
+    proc = subprocess.Popen(
+        _ffmpeg_cmd('pipe:0', sr),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    feeder = threading.Thread(target=_feed_stdin, args=(proc, chunks), daemon=True)
+    feeder.start()
+    return _stream_pcm(proc, block_samples, cleanup=[feeder.join])
+
+
+def _wav_data_span(head, sr):
+    """
+    (offset, size) of the sample data if `head` starts a 16-bit mono PCM WAV
+    at `sr` and holds its header up to the data chunk, else None
+    """
+    if head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        return None
+    pos = 12
+    pcm16_mono = False
+    while pos + 8 <= len(head):
+        chunk_id = head[pos:pos + 4]
+        size = struct.unpack('<I', head[pos + 4:pos + 8])[0]
+        if chunk_id == b'fmt ':
+            if pos + 24 > len(head):
+                return None
+            fmt_tag, channels, rate, _, _, bits = struct.unpack('<HHIIHH', head[pos + 8:pos + 24])
+            pcm16_mono = (fmt_tag, channels, rate, bits) == (1, 1, sr, 16)
+        elif chunk_id == b'data':
+            return (pos + 8, size) if pcm16_mono else None
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _iter_wav_pcm(first, chunks, size):
+    """float32 blocks from the raw 16-bit sample bytes of a WAV data chunk"""
+    # Streaming writers leave the size at 0 or 0xFFFFFFFF; then read to the end
+    remaining = size if 0 < size < 0xFFFFFFFF else None
+    carry = b''
+    for chunk in itertools.chain([first], chunks):
+        if remaining is not None:
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+        data = carry + chunk
+        usable = len(data) - len(data) % 2
+        carry = data[usable:]
+        if usable:
+            yield pcm16_to_float32(data[:usable])
+        if remaining == 0:
+            break
+
+
+def iter_decode_upload(chunks, fmt=None, sr=TARGET_SR, block_samples=TARGET_SR):
+    """
+    Decode an upload incrementally while its bytes are still arriving.
+
+    16-bit mono WAVs at `sr` are converted as they come in; anything else is
+    piped through ffmpeg (iter_decode_ffmpeg). Returns (decoder name, PCM
+    block iterator); the iterator raises DecodeError if ffmpeg fails.
+    """
+    chunks = iter(chunks)
+    # Enough of the upload to see a WAV header, including LIST/fact chunks
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= 4096:
+            break
+    data_span = _wav_data_span(head, sr)
+    if data_span is not None:
+        offset, size = data_span
+        return 'wav', _iter_wav_pcm(head[offset:], chunks, size)
+    return 'ffmpeg', iter_decode_ffmpeg(itertools.chain([head], chunks), fmt, sr, block_samples)
+
+
+def iter_decode_file(path, sr=TARGET_SR, block_samples=TARGET_SR):
+    """Incrementally decode an audio file on disk, block by block"""
+    proc = subprocess.Popen(
+        _ffmpeg_cmd(path, sr),
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    return _stream_pcm(proc, block_samples)
+
+
+@functools.lru_cache(maxsize=16)
+def _resample_filter(up, down):
+    # scipy.signal.resample_poly's default Kaiser low-pass, designed once and
+    # kept in float32 so filtering doesn't promote the signal to float64
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    return firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0)).astype(np.float32)
+
+
+def resample(y, orig_sr, sr=TARGET_SR):
+    """
+    Resample float32 mono PCM to `sr`, or return it untouched if it is
+    already there. Polyphase filtering is much cheaper than librosa's default
+    soxr_hq and ample for 13 MFCCs over a 16 kHz signal.
+    """
+    if orig_sr == sr:
+        return y
+    from scipy.signal import resample_poly
+
+    g = math.gcd(int(orig_sr), int(sr))
+    up, down = sr // g, orig_sr // g
+    return resample_poly(y, up, down, window=_resample_filter(up, down)).astype(np.float32, copy=False)
+
+
+def pcm16_to_float32(raw):
+    """16-bit little-endian PCM bytes to float32 in [-1, 1), as ffmpeg/soundfile scale it"""
+    y = np.frombuffer(raw, dtype='<i2').astype(np.float32)
+    y *= 1.0 / 32768
+    return y
+
+
+def decode_wav_pcm(data, sr=TARGET_SR):
+    """
+    Samples of a 16-bit mono WAV already at `sr`, or None if the upload is
+    anything else (and so needs ffmpeg)
+    """
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as w:
+            if (w.getnchannels(), w.getsampwidth(), w.getframerate()) != (1, 2, sr):
+                return None
+            return pcm16_to_float32(w.readframes(w.getnframes()))
+    except (wave.Error, EOFError):
+        return None
+
+
+def load_file(path, sr=TARGET_SR):
+    """
+    Mono float32 PCM of an audio file on disk at `sr`: read directly when it
+    is a 16-bit mono WAV at that rate, otherwise decoded with ffmpeg
+    """
+    try:
+        with wave.open(path, 'rb') as w:
+            if (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (1, 2, sr):
+                return pcm16_to_float32(w.readframes(w.getnframes()))
+    except (wave.Error, EOFError):
+        pass
+    blocks = list(iter_decode_file(path, sr))
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.float32)
+
+
+def decode_with_pydub(data, fmt=None, sr=TARGET_SR):
+    """Fallback: let pydub drive the conversion from an in-memory buffer"""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(io.BytesIO(data), format=fmt)
+    audio = audio.set_channels(1).set_frame_rate(sr)
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    # Scale integer PCM into [-1, 1] like librosa does
+    samples /= float(1 << (8 * audio.sample_width - 1))
+    return samples
+
+
+def decode_with_librosa(data, sr=TARGET_SR):
+    """Last resort: soundfile/audioread through librosa on an in-memory buffer"""
+    import librosa
+
+    y, native_sr = librosa.load(io.BytesIO(data), sr=None, dtype=np.float32)
+    return resample(y, native_sr, sr)
+
+
+def decode_audio(data, fmt=None, sr=TARGET_SR, skip=()):
+    """
+    Decode an upload held in memory to mono float32 PCM at `sr`.
+
+    WAVs already in the target layout are read directly; otherwise tries
+    ffmpeg first, then pydub, then librosa, leaving out any decoder named in
+    `skip`. Returns (y, sr).
+    """
+    if not data:
+        raise DecodeError("Upload is empty")
+    fmt = fmt.lower() if fmt else None
+
+    with span('decode_wav'):
+        y = decode_wav_pcm(data, sr)
+    if y is not None and len(y):
+        DECODES.inc(decoder='wav', outcome='ok')
+        logger.debug("16-bit mono %dHz WAV read directly: %d samples", sr, len(y))
+        return y, sr
+
+    decoders = [
+        ('ffmpeg', lambda: decode_with_ffmpeg(data, fmt, sr)),
+        ('pydub', lambda: decode_with_pydub(data, fmt, sr)),
+        ('librosa', lambda: decode_with_librosa(data, sr)),
+    ]
+    errors = []
+    for name, decode in decoders:
+        if name in skip:
+            continue
+        try:
+            # Failed attempts are timed too, so the cost of falling back shows up
+            with span(f'decode_{name}'):
+                y = decode()
+        except Exception as e:
+            DECODES.inc(decoder=name, outcome='error')
+            logger.warning("%s decode failed: %s", name, e)
+            errors.append(f"{name}: {e}")
+            continue
+        if len(y) == 0:
+            DECODES.inc(decoder=name, outcome='empty')
+            errors.append(f"{name}: no samples decoded")
+            continue
+        DECODES.inc(decoder=name, outcome='ok')
+        logger.debug("Decoded with %s: %d samples at %dHz", name, len(y), sr)
+        return y, sr
+
+    raise DecodeError("All decoders failed: " + "; ".join(errors))
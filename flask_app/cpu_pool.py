@@ -0,0 +1,212 @@
+"""
+Bounded executor for the CPU-bound feature work of the web app.
+
+    CPU_EXECUTOR  thread (default) - a thread pool in the web process; numpy's
+                  FFT and ffmpeg release the GIL, but single requests run
+                  inline on the request thread
+                  process - a pool of worker processes, so decoding and
+                  featurizing never contend for the web process's GIL
+    CPU_WORKERS   pool size (default min(8, cores); BATCH_WORKERS is still
+                  honoured for thread mode)
+    CPU_THREADS   BLAS/OpenMP threads per pool worker (default 1)
+
+Native thread pools are capped in every pool process and, in thread mode, in
+the web process itself, so N workers use N cores rather than N x cores
+threads fighting over them: through the BLAS/OpenMP environment variables
+before numpy and librosa are imported (prepare_web_process() in the web
+process), and with threadpoolctl once the feature stack has loaded. Pool processes are spawned (never forked from a
+threaded gunicorn worker) on first use, import the feature stack once and
+stay warm.
+
+Work sent to a pool process comes back with the stage spans and the decode
+and error counts it recorded, which are replayed into this process's metrics
+and the current request's Server-Timing.
+"""
+import os
+import atexit
+import logging
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ('thread', 'process')
+
+# Honoured by OpenBLAS, MKL, OpenMP and numba when set before they load
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMBA_NUM_THREADS')
+
+# Counters whose increments in a pool process are sent back to the parent
+_FORWARDED = (metrics.DECODES, metrics.ERRORS)
+
+# Keeps the worker's threadpoolctl limits alive
+_worker_limits = []
+
+
+def limit_native_threads(threads):
+    """Cap the BLAS/OpenMP pools already loaded in this process; None leaves them alone"""
+    if not threads:
+        return
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        logger.warning("threadpoolctl not installed; native thread pools are not capped")
+        return
+    _worker_limits.append(threadpool_limits(limits=threads))
+
+
+def set_thread_env(threads, override=True):
+    """Cap the native thread pools that have not loaded yet; they read these variables at load"""
+    if not threads:
+        return
+    for var in THREAD_ENV_VARS:
+        if override or var not in os.environ:
+            os.environ[var] = str(threads)
+
+
+def env_threads():
+    """CPU_THREADS as a thread cap, None when it is 0 (no cap)"""
+    threads = os.environ.get('CPU_THREADS', '1')
+    return int(threads) if threads != '0' else None
+
+
+def prepare_web_process():
+    """
+    Call before numpy or librosa are imported: in thread mode the pool shares
+    the web process's native thread pools, so cap them (unless the
+    environment already sets them explicitly)
+    """
+    if os.environ.get('CPU_EXECUTOR', 'thread').lower() == 'thread':
+        set_thread_env(env_threads(), override=False)
+
+
+def _init_worker(threads):
+    set_thread_env(threads)
+    # Import and warm the feature stack now, so its native libraries are
+    # loaded (and capped below) before the first task arrives
+    import numpy as np
+    import feature_engine
+    import pipeline  # noqa: F401
+    feature_engine.extract_feature_vector(np.zeros(feature_engine.SR, dtype=np.float32))
+    feature_engine.extract_feature_batch(np.zeros((1, feature_engine.SR), dtype=np.float32))
+    limit_native_threads(threads)
+
+
+def _traced_call(fn, args):
+    """Run fn in a pool process; returns (result, spans, counter deltas)"""
+    spans = metrics.start_request()
+    before = [counter.snapshot() for counter in _FORWARDED]
+    result = fn(*args)
+    deltas = []
+    for counter, old in zip(_FORWARDED, before):
+        new = counter.snapshot()
+        deltas.append({key: value - old.get(key, 0) for key, value in new.items() if value != old.get(key, 0)})
+    return result, spans, deltas
+
+
+class CpuPool:
+    def __init__(self, mode='thread', workers=None, threads=1):
+        if mode not in MODES:
+            raise ValueError(f"CPU executor must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.threads = threads
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.cap_loaded_libraries()
+
+    def cap_loaded_libraries(self):
+        """
+        Thread mode: cap the native pools loaded in this process so far. Run
+        again once the feature stack is imported; threadpoolctl only sees
+        libraries that are already loaded.
+        """
+        if self.mode == 'thread':
+            # The pool's threads share this process's BLAS with the request threads
+            limit_native_threads(self.threads)
+
+    def _get_executor(self):
+        # Created lazily, and again after a fork (gunicorn --preload) or a crash
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(self.threads,),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cpu')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _result(self, future):
+        if self.mode == 'thread':
+            return future.result()
+        try:
+            result, spans, deltas = future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time
+            with self._lock:
+                self._executor = None
+            raise
+        for name, seconds in spans:
+            metrics.record_span(name, seconds)
+        for counter, delta in zip(_FORWARDED, deltas):
+            counter.merge(delta)
+        return result
+
+    def run_all(self, calls):
+        """
+        Run (fn, args) calls concurrently and return their results in order.
+        In thread mode a lone call runs inline on the calling thread.
+        """
+        if self.mode == 'thread' and len(calls) == 1:
+            fn, args = calls[0]
+            return [fn(*args)]
+        executor = self._get_executor()
+        if self.mode == 'process':
+            futures = [executor.submit(_traced_call, fn, args) for fn, args in calls]
+        else:
+            # Each task runs in a copy of the caller's context so its spans
+            # still land in the request's Server-Timing
+            futures = [executor.submit(contextvars.copy_context().run, fn, *args) for fn, args in calls]
+        return [self._result(future) for future in futures]
+
+    def run(self, fn, *args):
+        return self.run_all([(fn, args)])[0]
+
+    def start(self):
+        """
+        Begin spawning the pool processes in the background, once per web
+        process, so the first request doesn't wait for their imports
+        """
+        if self.mode == 'process' and self._pid != os.getpid():
+            self._get_executor().submit(os.getpid)
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {'mode': self.mode, 'workers': self.workers, 'threads_per_worker': self.threads}
+
+
+def from_env():
+    """The CpuPool configured by CPU_EXECUTOR / CPU_WORKERS / CPU_THREADS"""
+    workers = os.environ.get('CPU_WORKERS') or os.environ.get('BATCH_WORKERS')
+    pool = CpuPool(
+        mode=os.environ.get('CPU_EXECUTOR', 'thread').lower(),
+        workers=int(workers) if workers else None,
+        threads=env_threads(),
+    )
+    atexit.register(pool.shutdown)
+    return pool
@@ -0,0 +1,184 @@
+"""
+Fused feature engine for the 30-dim Rolex feature vector.
+
+The original pipeline called librosa.feature.mfcc, zero_crossing_rate and
+spectral_centroid one after another, which framed the signal three times and
+ran the STFT twice. Here the STFT is computed once: the power spectrum feeds
+the mel filterbank/MFCC, the magnitude spectrum feeds the centroid, and ZCR is
+computed on the same 2048/512 frame grid.
+
+Tolerance: the output matches the separate librosa calls to within float32
+rounding (max abs diff < 1e-4 on MFCC dB values, relative diff < 1e-5 on the
+centroid, exact on ZCR), since the same filters and padding are used.
+
+extract_feature_batch() featurizes many equal-length windows at once: one
+batched STFT, then ZCR, centroid and the mean/std reductions in the Numba
+kernels of feature_kernels.py. Without numba (or with FEATURE_KERNELS=numpy)
+those steps run as whole-batch NumPy array operations instead; both give the
+same results as extract_feature_vector per window.
+"""
+import os
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SR = 16000
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+N_MELS = 128
+
+FEATURE_NAMES = [f'mfcc_mean_{i}' for i in range(N_MFCC)] + \
+                [f'mfcc_std_{i}' for i in range(N_MFCC)] + \
+                ['zcr_mean', 'zcr_std', 'spec_cent_mean', 'spec_cent_std']
+
+# Everything that changes the numbers in the vector; hashed by the dataset
+# tooling to decide when cached features are stale
+FEATURE_CONFIG = {
+    'sr': SR,
+    'n_fft': N_FFT,
+    'hop_length': HOP_LENGTH,
+    'n_mfcc': N_MFCC,
+    'n_mels': N_MELS,
+    'window': 'hann',
+}
+
+_mel_basis_cache = {}
+_kernels = {}
+
+
+def _mel_basis(sr):
+    if sr not in _mel_basis_cache:
+        import librosa
+        _mel_basis_cache[sr] = librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=N_MELS)
+    return _mel_basis_cache[sr]
+
+
+def _frame(y):
+    """Strided (no-copy) view of y as (frame_length, n_frames), librosa layout"""
+    n_frames = 1 + (len(y) - N_FFT) // HOP_LENGTH
+    return np.lib.stride_tricks.as_strided(
+        y,
+        shape=(N_FFT, n_frames),
+        strides=(y.strides[0], y.strides[0] * HOP_LENGTH),
+        writeable=False,
+    )
+
+
+def frame_features(y, sr=SR):
+    """
+    Per-frame MFCC (13 x T), ZCR (T,) and spectral centroid (T,) from one STFT.
+    """
+    import librosa
+    import scipy.fft
+
+    # One STFT for all spectral features
+    stft = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH, center=True)
+    mag = np.abs(stft)
+
+    # MFCC: mel filterbank on the power spectrum -> dB -> DCT-II
+    mel = _mel_basis(sr) @ (mag * mag)
+    mfcc = scipy.fft.dct(librosa.power_to_db(mel), axis=-2, type=2, norm='ortho')[:N_MFCC]
+
+    # Spectral centroid: magnitude-weighted mean frequency per frame
+    freqs = np.fft.rfftfreq(N_FFT, d=1.0 / sr).reshape(-1, 1)
+    norm = mag.sum(axis=0, keepdims=True)
+    norm[norm < np.finfo(mag.dtype).tiny] = 1.0
+    spec_cent = (freqs * (mag / norm)).sum(axis=0)
+
+    # ZCR on the same frame grid (librosa edge-pads here, not zero-pads)
+    padded = np.pad(y, N_FFT // 2, mode='edge')
+    frames = _frame(np.ascontiguousarray(padded))
+    # Same as signbit(where(|x| <= 1e-10, 0, x)) without a float32 copy of the frames
+    signs = np.signbit(frames) & (np.abs(frames) > 1e-10)
+    zcr = (signs[1:] != signs[:-1]).sum(axis=0) / N_FFT
+
+    return mfcc, zcr, spec_cent
+
+
+def summarize(mfcc, zcr, spec_cent):
+    """Collapse per-frame features into the 30-dim mean/std training vector"""
+    return np.hstack([
+        np.mean(mfcc, axis=1),     # mfcc_mean_0 to mfcc_mean_12 (13 features)
+        np.std(mfcc, axis=1),      # mfcc_std_0 to mfcc_std_12 (13 features)
+        np.mean(zcr),              # zcr_mean (1 feature)
+        np.std(zcr),               # zcr_std (1 feature)
+        np.mean(spec_cent),        # spec_cent_mean (1 feature)
+        np.std(spec_cent)          # spec_cent_std (1 feature)
+    ])
+
+
+def extract_feature_vector(y, sr=SR):
+    """Compute the 30-dim feature vector for a mono signal"""
+    return summarize(*frame_features(y, sr))
+
+
+def _load_kernels():
+    """feature_kernels, or None when numba is unavailable or disabled"""
+    if 'module' not in _kernels:
+        _kernels['module'] = None
+        if os.environ.get('FEATURE_KERNELS', 'numba').lower() == 'numba':
+            try:
+                import feature_kernels
+                _kernels['module'] = feature_kernels
+            except Exception as e:  # missing numba, or no writable kernel cache
+                logger.warning(f"Numba feature kernels unavailable, using NumPy: {e}")
+    return _kernels['module']
+
+
+def _numpy_batch_features(windows, mag, mfcc, sr):
+    """ZCR, centroid and the mean/std reductions as whole-batch NumPy operations"""
+    freqs = np.fft.rfftfreq(N_FFT, d=1.0 / sr).reshape(-1, 1)
+    norm = mag.sum(axis=1, keepdims=True)
+    norm[norm < np.finfo(mag.dtype).tiny] = 1.0
+    spec_cent = (freqs * (mag / norm)).sum(axis=1)
+
+    # ZCR from a running count of sign changes over each edge-padded window,
+    # rather than materializing every (overlapping) frame
+    padded = np.pad(windows, ((0, 0), (N_FFT // 2, N_FFT // 2)), mode='edge')
+    signs = np.signbit(padded) & (np.abs(padded) > 1e-10)
+    changes = np.zeros(padded.shape, dtype=np.int64)
+    np.cumsum(signs[:, 1:] != signs[:, :-1], axis=1, out=changes[:, 1:])
+    starts = np.arange(1 + (padded.shape[1] - N_FFT) // HOP_LENGTH) * HOP_LENGTH
+    zcr = (changes[:, starts + N_FFT - 1] - changes[:, starts]) / N_FFT
+
+    return np.concatenate([
+        np.mean(mfcc, axis=2),
+        np.std(mfcc, axis=2),
+        np.stack([np.mean(zcr, axis=1), np.std(zcr, axis=1),
+                  np.mean(spec_cent, axis=1), np.std(spec_cent, axis=1)], axis=1),
+    ], axis=1)
+
+
+def extract_feature_batch(windows, sr=SR, kernels=True):
+    """
+    30-dim vectors for a batch of equal-length windows: (B, samples) -> (B, 30).
+    kernels=False forces the NumPy path (for parity checks and benchmarks).
+    """
+    windows = np.ascontiguousarray(windows, dtype=np.float32)
+    if len(windows) == 0:
+        return np.empty((0, len(FEATURE_NAMES)))
+
+    import librosa
+    import scipy.fft
+
+    stft = librosa.stft(windows, n_fft=N_FFT, hop_length=HOP_LENGTH, center=True)
+    # librosa returns Fortran order; the kernels walk (window, bin, frame)
+    mag = np.ascontiguousarray(np.abs(stft))
+
+    # Same as librosa.power_to_db(ref=1.0, top_db=80) per window; its top_db
+    # clip is relative to the maximum of each window, not of the batch
+    log_mel = 10.0 * np.log10(np.maximum(1e-10, _mel_basis(sr) @ (mag * mag)))
+    log_mel = np.maximum(log_mel, log_mel.max(axis=(1, 2), keepdims=True) - 80.0)
+    mfcc = scipy.fft.dct(log_mel, axis=-2, type=2, norm='ortho')[:, :N_MFCC]
+
+    module = _load_kernels() if kernels else None
+    if module is None:
+        return _numpy_batch_features(windows, mag, mfcc, sr)
+
+    freqs = np.fft.rfftfreq(N_FFT, d=1.0 / sr)
+    spec_cent = module.centroid_batch(mag, freqs)
+    zcr = module.zcr_batch(windows, N_FFT, HOP_LENGTH, np.float32(1e-10))
+    return module.summarize_batch(np.ascontiguousarray(mfcc), zcr, spec_cent)
@@ -0,0 +1,106 @@
+"""
+Numba kernels for the project-specific parts of the feature vector.
+
+These cover what librosa doesn't already vectorize well over a batch of
+equal-length windows: framewise zero-crossing rate, spectral centroid from a
+precomputed magnitude spectrum, and the mean/std reductions that collapse the
+frame features into the 30-dim vector. They follow the exact definitions
+feature_engine.frame_features uses (librosa's, with center=True framing), so
+results match the librosa path to float rounding.
+
+Kernels are compiled with cache=True: the machine code is written to
+__pycache__ on first use and loaded from there by later processes, so the JIT
+does not add to cold start.
+"""
+import numpy as np
+from numba import njit
+
+TINY32 = np.finfo(np.float32).tiny
+
+
+@njit(cache=True)
+def zcr_batch(y, n_fft, hop, threshold):
+    """
+    Framewise ZCR of (windows, samples) float32 signals, librosa-style:
+    edge-padded by n_fft // 2 and samples with |x| <= threshold count as zero.
+    Returns (windows, frames) float64.
+    """
+    n_windows, n = y.shape
+    pad = n_fft // 2
+    padded_len = n + 2 * pad
+    n_frames = 1 + (padded_len - n_fft) // hop
+    out = np.empty((n_windows, n_frames))
+    # crossings[i]: sign changes between consecutive padded samples up to i
+    crossings = np.empty(padded_len, np.int64)
+    neg_threshold = -threshold
+    for b in range(n_windows):
+        crossings[0] = 0
+        prev = y[b, 0] < neg_threshold
+        for i in range(1, padded_len):
+            j = min(max(i - pad, 0), n - 1)
+            cur = y[b, j] < neg_threshold
+            crossings[i] = crossings[i - 1] + (cur != prev)
+            prev = cur
+        for t in range(n_frames):
+            start = t * hop
+            out[b, t] = (crossings[start + n_fft - 1] - crossings[start]) / n_fft
+    return out
+
+
+@njit(cache=True)
+def centroid_batch(mag, freqs):
+    """
+    Spectral centroid per frame from a (windows, bins, frames) float32
+    magnitude spectrum and the bin frequencies. Returns (windows, frames).
+    """
+    n_windows, n_bins, n_frames = mag.shape
+    out = np.zeros((n_windows, n_frames))
+    norm = np.empty(n_frames, np.float32)
+    for b in range(n_windows):
+        norm[:] = 0
+        for f in range(n_bins):
+            for t in range(n_frames):
+                norm[t] += mag[b, f, t]
+        for t in range(n_frames):
+            if norm[t] < TINY32:
+                norm[t] = 1.0
+        for f in range(n_bins):
+            for t in range(n_frames):
+                out[b, t] += freqs[f] * (mag[b, f, t] / norm[t])
+    return out
+
+
+@njit(cache=True)
+def _mean_std(x):
+    total = 0.0
+    for v in x:
+        total += v
+    mean = total / x.size
+    sq = 0.0
+    for v in x:
+        d = v - mean
+        sq += d * d
+    return mean, np.sqrt(sq / x.size)
+
+
+@njit(cache=True)
+def summarize_batch(mfcc, zcr, spec_cent):
+    """
+    (windows, 30) vectors in FEATURE_NAMES order from (windows, 13, frames)
+    MFCCs and (windows, frames) ZCR and centroid.
+    """
+    n_windows, n_mfcc, _ = mfcc.shape
+    out = np.empty((n_windows, 2 * n_mfcc + 4))
+    for b in range(n_windows):
+        for k in range(n_mfcc):
+            mean, std = _mean_std(mfcc[b, k])
+            # NumPy reduces the float32 MFCCs to float32 results
+            out[b, k] = np.float32(mean)
+            out[b, n_mfcc + k] = np.float32(std)
+        mean, std = _mean_std(zcr[b])
+        out[b, 2 * n_mfcc] = mean
+        out[b, 2 * n_mfcc + 1] = std
+        mean, std = _mean_std(spec_cent[b])
+        out[b, 2 * n_mfcc + 2] = mean
+        out[b, 2 * n_mfcc + 3] = std
+    return out
@@ -0,0 +1,293 @@
+"""
+Compile the served Pipeline(StandardScaler, RandomForestClassifier) into flat
+NumPy arrays and evaluate every tree at once.
+
+sklearn's predict_proba pays for input validation and joblib dispatch on every
+call, which dominates the cost for a single 1x30 row. The compiled form keeps
+the scaler's mean/scale and, for all trees concatenated, each node's feature
+index, threshold, children and normalized leaf probabilities. Inference walks
+all trees in lock-step for max_depth steps with fancy indexing.
+
+Results are identical to predict_proba: inputs are scaled in float64 and cast
+to float32 before comparison (as sklearn's tree code does), leaf values are
+normalized the same way, and per-tree probabilities are summed in tree order.
+Thresholds are stored as float32, rounded down, which is exact for float32
+inputs; node indices use the smallest integer type that fits.
+
+compile_model(max_trees=..., max_depth=...) exports a smaller forest: only the
+first trees are kept, and deeper subtrees are cut so the node at the depth
+limit becomes a leaf predicting its training class distribution. That trades
+accuracy for size and latency, so it is no longer identical to sklearn.
+
+Usage (export next to an existing model):
+    python flask_app/forest_compiler.py model/rolex_model.pkl
+"""
+import os
+import sys
+import shutil
+
+import numpy as np
+
+# Marker sklearn uses for leaves in tree_.children_left/right
+TREE_LEAF = -1
+
+
+class CompiledForest:
+    def __init__(self, arrays):
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.classes_ = arrays['classes']
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features'])
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def arrays(self):
+        return {
+            'mean': self.mean,
+            'scale': self.scale,
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'roots': self.roots,
+            'classes': self.classes_,
+            'max_depth': np.asarray(self.max_depth),
+            'n_features': np.asarray(self.n_features_in_),
+        }
+
+    def transform(self, X):
+        """StandardScaler.transform, then the float32 cast sklearn trees apply"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}")
+        return ((X - self.mean) / self.scale).astype(np.float32)
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (n_samples, n_trees)"""
+        Xs = self.transform(X)
+        rows = np.arange(Xs.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (Xs.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = Xs[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # (n_trees, n_samples, n_classes), reduced over the leading axis so the
+        # trees are summed sequentially in the same order as sklearn
+        per_tree = self.value[leaves.T]
+        return np.add.reduce(per_tree, axis=0) / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _split_pipeline(model):
+    """Return (scaler or None, forest) for a fitted pipeline or bare forest"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    scaler, forest = None, model
+    if isinstance(model, Pipeline):
+        steps = [step for _, step in model.steps if step not in (None, 'passthrough')]
+        if len(steps) == 2 and isinstance(steps[0], StandardScaler):
+            scaler, forest = steps
+        elif len(steps) == 1:
+            forest = steps[0]
+        else:
+            raise TypeError(f"Unsupported pipeline layout: {[type(s).__name__ for s in steps]}")
+    if not isinstance(forest, RandomForestClassifier):
+        raise TypeError(f"Unsupported estimator: {type(forest).__name__}")
+    return scaler, forest
+
+
+def _node_depths(left, right):
+    """Depth of every node; sklearn nodes are numbered parent-before-child"""
+    depth = np.zeros(len(left), dtype=np.int64)
+    frontier = np.array([0])
+    d = 0
+    while frontier.size:
+        internal = frontier[left[frontier] != TREE_LEAF]
+        frontier = np.concatenate([left[internal], right[internal]])
+        d += 1
+        depth[frontier] = d
+    return depth
+
+
+def _smallest_int(max_value):
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _float32_floor(x):
+    """Largest float32 <= x, so `v <= floor(t)` equals `v <= t` for float32 v"""
+    x32 = x.astype(np.float32)
+    over = x32.astype(np.float64) > x
+    x32[over] = np.nextafter(x32[over], np.float32(-np.inf))
+    return x32
+
+
+def compile_model(model, max_trees=None, max_depth=None):
+    """
+    Flatten a fitted scaler + RandomForestClassifier into a CompiledForest,
+    optionally keeping only the first `max_trees` trees cut at `max_depth`.
+    """
+    scaler, forest = _split_pipeline(model)
+    n_features = forest.n_features_in_
+    n_classes = len(forest.classes_)
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    walk_depth = 0
+    for estimator in forest.estimators_[:max_trees]:
+        tree = estimator.tree_
+        left, right = tree.children_left, tree.children_right
+        is_leaf = left == TREE_LEAF
+        keep = np.ones(tree.node_count, dtype=bool)
+        if max_depth is not None and tree.max_depth > max_depth:
+            depth = _node_depths(left, right)
+            is_leaf |= depth == max_depth
+            keep = depth <= max_depth
+        # Old node id -> position in the flat arrays
+        new_id = np.cumsum(keep) - 1 + offset
+        is_leaf = is_leaf[keep]
+        node_ids = new_id[keep]
+
+        # Leaves point at themselves and always "go left", so trees of
+        # different depth can be walked for the same number of steps
+        features.append(np.where(is_leaf, 0, tree.feature[keep]))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold[keep]))
+        lefts.append(np.where(is_leaf, node_ids, new_id[np.where(is_leaf, 0, left[keep])]))
+        rights.append(np.where(is_leaf, node_ids, new_id[np.where(is_leaf, 0, right[keep])]))
+
+        # Same normalization as DecisionTreeClassifier.predict_proba
+        value = tree.value[keep, 0, :n_classes].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        walk_depth = max(walk_depth, tree.max_depth if max_depth is None else min(tree.max_depth, max_depth))
+        offset += len(node_ids)
+
+    index_dtype = _smallest_int(offset)
+    return CompiledForest({
+        'mean': np.asarray(scaler.mean_ if scaler is not None and scaler.with_mean else np.zeros(n_features)),
+        'scale': np.asarray(scaler.scale_ if scaler is not None and scaler.with_std else np.ones(n_features)),
+        'feature': np.concatenate(features).astype(_smallest_int(n_features)),
+        'threshold': _float32_floor(np.concatenate(thresholds)),
+        'left': np.concatenate(lefts).astype(index_dtype),
+        'right': np.concatenate(rights).astype(index_dtype),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=index_dtype),
+        'classes': np.asarray(forest.classes_),
+        'max_depth': walk_depth,
+        'n_features': n_features,
+    })
+
+
+def prune_to_budget(model, X, y, max_accuracy_drop, tree_counts=None, depths=None):
+    """
+    The cheapest forest (fewest trees x walk steps) whose accuracy on (X, y)
+    is within `max_accuracy_drop` of the full forest. Returns
+    (compiled, full accuracy, pruned accuracy).
+    """
+    full = compile_model(model)
+    y = np.asarray(y)
+    full_accuracy = float(np.mean(full.predict(X) == y))
+    n, depth = full.n_trees, full.max_depth
+    tree_counts = tree_counts or sorted({n} | {k for k in (10, 25, 50, 100, 150) if k < n})
+    depths = depths or sorted({depth} | {d for d in (6, 8, 10, 12, 16, 24) if d < depth})
+
+    best_cost, best, best_accuracy = n * depth, full, full_accuracy
+    for trees in tree_counts:
+        for max_depth in depths:
+            if trees * max_depth >= best_cost:
+                continue
+            compiled = compile_model(model, max_trees=trees, max_depth=max_depth)
+            accuracy = float(np.mean(compiled.predict(X) == y))
+            if accuracy >= full_accuracy - max_accuracy_drop:
+                best_cost, best, best_accuracy = trees * max_depth, compiled, accuracy
+    return best, full_accuracy, best_accuracy
+
+
+def compiled_path_for(model_path):
+    """Where the compiled arrays for a .pkl model are stored"""
+    return os.path.splitext(model_path)[0] + '.forest'
+
+
+def save_compiled(compiled, path):
+    """
+    Write one .npy file per array into the directory `path` (or a single
+    .npz if the path ends in .npz). The directory is built next to the target
+    and swapped in, so a reader never sees a partial export.
+    """
+    if path.endswith('.npz'):
+        np.savez(path, **compiled.arrays())
+        return
+    tmp_path, old_path = path + '.tmp', path + '.old'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for key, value in compiled.arrays().items():
+        np.save(os.path.join(tmp_path, key + '.npy'), value)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_compiled(path, mmap_mode=None):
+    """
+    Load an exported forest. For a directory export, mmap_mode='r' maps the
+    arrays read-only instead of reading them, so every process serving the
+    same file shares one copy in the page cache.
+    """
+    if os.path.isdir(path):
+        return CompiledForest({
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in os.listdir(path) if name.endswith('.npy')
+        })
+    with np.load(path, allow_pickle=False) as data:
+        return CompiledForest({key: data[key] for key in data.files})
+
+
+def stored_bytes(path):
+    """Size on disk of an export (file or directory)"""
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+
+def export(model_path, output_path=None):
+    """Compile a joblib-pickled pipeline and write its arrays alongside it"""
+    import joblib
+
+    model = joblib.load(model_path)
+    compiled = compile_model(model)
+    output_path = output_path or compiled_path_for(model_path)
+    save_compiled(compiled, output_path)
+    return compiled, output_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python forest_compiler.py <model.pkl> [output dir or .npz]")
+        sys.exit(1)
+    compiled, path = export(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Compiled {compiled.n_trees} trees ({len(compiled.feature)} nodes, depth {compiled.max_depth}) to {path}")
@@ -0,0 +1,181 @@
+"""
+SQLite-backed job queue for long or heavy uploads.
+
+`POST /api/jobs` stores the upload and returns immediately; a small pool of
+worker threads in each gunicorn worker claims queued jobs from the shared
+database, runs feature extraction + prediction, and stores the result for
+`GET /api/jobs/<id>`. Because the queue lives in one SQLite file, any worker
+can answer a poll for any job, and no external broker is needed.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import tempfile
+import threading
+import logging
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    fmt TEXT,
+    payload BLOB,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    """Raised when the number of pending jobs has reached the configured limit"""
+
+
+class JobQueue:
+    def __init__(self, process_fn, db_path=None, concurrency=1, max_pending=16,
+                 result_ttl=3600, stale_after=600, poll_interval=0.5):
+        self.process_fn = process_fn
+        self.db_path = db_path or os.path.join(tempfile.gettempdir(), 'rolex_jobs.sqlite3')
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def start(self):
+        """
+        Start this process's worker threads, which also pick up jobs left
+        queued by a restarted worker. Call after gunicorn forks (threads
+        don't survive a fork); later calls are no-ops.
+        """
+        if self._workers and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._workers and self._pid == os.getpid():
+                return
+            self._workers = []
+            self._pid = os.getpid()
+            for n in range(self.concurrency):
+                worker = threading.Thread(target=self._run, name=f'job-worker-{n}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def pending_count(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)', (QUEUED, RUNNING)).fetchone()
+        return row[0]
+
+    def submit(self, payload, fmt, filename=None):
+        """Queue an upload and return its job id; raises QueueFull when saturated"""
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            # Check-and-insert under one write lock so concurrent workers can't overshoot
+            conn.execute('BEGIN IMMEDIATE')
+            pending = conn.execute('SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)', (QUEUED, RUNNING)).fetchone()[0]
+            if pending >= self.max_pending:
+                conn.execute('ROLLBACK')
+                raise QueueFull(f"{pending} jobs pending (max {self.max_pending})")
+            conn.execute(
+                'INSERT INTO jobs (id, status, filename, fmt, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, filename, fmt, sqlite3.Binary(payload), time.time()),
+            )
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Job status and result as a dict, or None for unknown/expired ids"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT id, status, filename, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?',
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('job_id', 'status', 'filename', 'result', 'error', 'created_at', 'started_at', 'finished_at'), row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def _claim(self):
+        """Atomically take the oldest queued job (or one abandoned by a dead worker)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT id, fmt, payload FROM jobs WHERE status = ? OR (status = ? AND started_at < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (QUEUED, RUNNING, now - self.stale_after),
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?', (RUNNING, now, row[0]))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return row
+
+    def _finish(self, job_id, result=None, error=None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, payload = NULL, finished_at = ? WHERE id = ?',
+                (FAILED if error else DONE, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def _expire(self):
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?',
+                         (DONE, FAILED, time.time() - self.result_ttl))
+
+    def _run(self):
+        last_expiry = 0.0
+        while True:
+            try:
+                if time.time() - last_expiry > 60:
+                    self._expire()
+                    last_expiry = time.time()
+
+                job = self._claim()
+                if job is None:
+                    # Other processes may enqueue too, so poll as well as wait
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+
+                job_id, fmt, payload = job
+                logger.info(f"Job {job_id} started")
+                try:
+                    self._finish(job_id, result=self.process_fn(bytes(payload), fmt))
+                    logger.info(f"Job {job_id} finished")
+                except Exception as e:
+                    logger.error(f"Job {job_id} failed: {e}")
+                    self._finish(job_id, error=str(e))
+            except sqlite3.Error as e:
+                logger.error(f"Job queue database error: {e}")
+                time.sleep(self.poll_interval)
@@ -0,0 +1,105 @@
+"""
+Logging setup for the web app.
+
+Records are put on an in-memory queue by a QueueHandler and written to stderr
+by a QueueListener thread, so a request thread never blocks on a log write;
+formatting and the write happen on the listener thread.
+
+    LOG_LEVEL   INFO (default), DEBUG for the verbose per-stage traces, WARNING...
+    LOG_FORMAT  text (default) or json: one JSON object per line, with any
+                `extra={"fields": {...}}` merged into it
+
+The per-request access line (app.log_request) carries stage timings and the
+outcome as fields, so with LOG_FORMAT=json each request is exactly one
+machine-readable line.
+"""
+import os
+import sys
+import json
+import time
+import copy
+import queue
+import atexit
+import logging
+import logging.handlers
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{k}={json.dumps(v, default=str)}' for k, v in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only resolve the message now (its args may change after the call);
+        # unlike the stock prepare(), leave formatting and exc_info to the
+        # listener's formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if os.environ.get('LOG_FORMAT', 'text').lower() == 'json'
+                         else TextFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return log_queue
+
+
+def _restart_after_fork():
+    # The listener thread does not survive gunicorn --preload's fork: give the
+    # child its own queue and thread, or its records would pile up unread
+    if _listener is None:
+        return
+    log_queue = _start_listener()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _QueueHandler):
+            handler.queue = log_queue
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """Route the root logger through the queue; safe to call more than once"""
+    root = logging.getLogger()
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    if _listener is not None:
+        return
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(_start_listener()))
+    atexit.register(_stop_listener)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_after_fork)
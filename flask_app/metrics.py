@@ -0,0 +1,184 @@
+"""
+In-process metrics with Prometheus text exposition, and per-request timing spans.
+
+    with span('decode'):
+        ...
+
+records the stage duration into the `rolex_stage_seconds` histogram and, when
+a request is being traced, into that request's span list (used for the
+Server-Timing header). Spans are carried in a ContextVar, so work handed to a
+thread pool keeps reporting to its request when submitted through
+`contextvars.copy_context().run`.
+
+Metrics are per process: with several gunicorn workers each scrape of
+/metrics sees the worker that answered it.
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; covers everything from a cached lookup to a long ffmpeg decode
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, delta):
+        """Add counts recorded elsewhere, e.g. a snapshot delta from a pool process"""
+        with self._lock:
+            for key, amount in delta.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets + ('+Inf',), series):
+                    labels = _labels(self.labelnames + ('le',), key + (bound,))
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{labels} {series[len(self.buckets)]}')
+        return lines
+
+
+class CallbackGauge:
+    """A value read at scrape time, e.g. counters another component keeps"""
+
+    def __init__(self, name, help, fn, type='gauge'):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.type = type
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}', f'{self.name} {self.fn()}']
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'rolex_stage_seconds', 'Time spent in each pipeline stage', ('stage',)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'rolex_request_seconds', 'Request latency by endpoint', ('endpoint',)))
+REQUESTS = REGISTRY.register(Counter(
+    'rolex_requests_total', 'Requests by endpoint and HTTP status', ('endpoint', 'status')))
+DECODES = REGISTRY.register(Counter(
+    'rolex_decode_total', 'Decode attempts by decoder (wav, ffmpeg, pydub, librosa) and outcome',
+    ('decoder', 'outcome')))
+ERRORS = REGISTRY.register(Counter(
+    'rolex_errors_total', 'Pipeline failures by stage', ('stage',)))
+
+# Spans of the request being handled: a list of (name, seconds), or None
+_spans = contextvars.ContextVar('rolex_spans', default=None)
+
+
+def start_request():
+    """Begin collecting spans for the current request; returns the span list"""
+    spans = []
+    _spans.set(spans)
+    return spans
+
+
+def current_spans():
+    return _spans.get()
+
+
+def record_span(name, seconds):
+    """Record a stage duration measured elsewhere (e.g. in a pool process)"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def server_timing(spans, total=None):
+    """Server-Timing header value; repeated stages (batch uploads) are summed"""
+    totals = {}
+    counts = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+        counts[name] = counts.get(name, 0) + 1
+    parts = [
+        f'{name};dur={seconds * 1000:.1f}' + (f';desc="x{counts[name]}"' if counts[name] > 1 else '')
+        for name, seconds in totals.items()
+    ]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
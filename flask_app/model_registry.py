@@ -0,0 +1,148 @@
+"""
+Versioned model registry.
+
+Each trained model is published as an immutable version directory, and a
+CURRENT file names the one to serve:
+
+    model/registry/
+        CURRENT                 active version id, replaced atomically
+        <version>/
+            model.pkl           joblib pipeline
+            model.forest/       compiled arrays (forest_compiler)
+            metadata.json       feature schema, train date, metrics, params
+
+Version ids are "<UTC timestamp>-<pickle digest>" (with a "-<n>" suffix when
+the same pickle is published again within the second), so they sort by age
+and change whenever the model does; the web app uses them as the result cache
+key. Switching versions only rewrites CURRENT, and running workers pick the
+change up between requests.
+
+Usage:
+    python flask_app/model_registry.py list
+    python flask_app/model_registry.py activate <version>
+    python flask_app/model_registry.py publish <model.pkl> [metadata.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+
+CURRENT_FILE = 'CURRENT'
+MODEL_FILE = 'model.pkl'
+METADATA_FILE = 'metadata.json'
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ServedModel:
+    """One loaded model version; swapped as a whole on reload"""
+
+    def __init__(self, version, model, predictor, path, metadata=None):
+        self.version = version
+        self.model = model
+        self.predictor = predictor
+        self.path = path
+        self.metadata = metadata or {}
+
+    @property
+    def classes_(self):
+        return self.predictor.classes_
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+        self.current_path = os.path.join(root, CURRENT_FILE)
+
+    def exists(self):
+        return os.path.exists(self.current_path)
+
+    def current_version(self):
+        try:
+            with open(self.current_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, METADATA_FILE)))
+
+    def model_path(self, version):
+        return os.path.join(self.root, version, MODEL_FILE)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    def publish(self, model_path, metadata=None, compiled=None, activate=True):
+        """
+        Copy a trained pickle (and its compiled forest) into a new version
+        directory; the directory only appears once it is complete.
+        """
+        from forest_compiler import compiled_path_for, save_compiled
+
+        version = base = time.strftime('%Y%m%d-%H%M%S', time.gmtime()) + '-' + _digest(model_path)[:8]
+        n = 1
+        while os.path.exists(os.path.join(self.root, version)):
+            n += 1
+            version = f'{base}-{n}'
+        staging = os.path.join(self.root, f'.{version}.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        target_model = os.path.join(staging, MODEL_FILE)
+        shutil.copyfile(model_path, target_model)
+        # Written after the pickle, so the app sees the compiled forest as fresh
+        if compiled is not None:
+            save_compiled(compiled, compiled_path_for(target_model))
+        with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+            json.dump({'version': version, 'published': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                       **(metadata or {})}, f, indent=1, default=str)
+
+        os.rename(staging, os.path.join(self.root, version))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Atomically make `version` the one every worker serves"""
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version {version!r}")
+        tmp_path = self.current_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, self.current_path)
+
+
+if __name__ == "__main__":
+    registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR') or
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model', 'registry'))
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if command == 'list':
+        current = registry.current_version()
+        for version in registry.versions():
+            meta = registry.metadata(version)
+            print(f"{'*' if version == current else ' '} {version}  {json.dumps(meta.get('metrics', {}))}")
+    elif command == 'activate' and len(sys.argv) == 3:
+        registry.activate(sys.argv[2])
+        print(f"Activated {sys.argv[2]}")
+    elif command == 'publish' and len(sys.argv) in (3, 4):
+        metadata = {}
+        if len(sys.argv) == 4:
+            with open(sys.argv[3]) as f:
+                metadata = json.load(f)
+        print(f"Published {registry.publish(sys.argv[2], metadata)}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,62 @@
+"""
+Upload -> feature vector, the CPU-bound part of a prediction.
+
+Kept out of app.py so the functions here can run in cpu_pool's worker
+processes, which must not import the web app (and its model) to use them.
+"""
+import logging
+
+from audio_decoder import decode_audio, DecodeError
+from feature_engine import frame_features, summarize
+from metrics import span, ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+def extract_features(audio_bytes, fmt=None):
+    """Extract features matching the training format exactly"""
+    try:
+        logger.debug("Extracting features: %d bytes, format %s", len(audio_bytes) if audio_bytes else 0, fmt)
+
+        if not audio_bytes:
+            logger.warning("Upload is empty")
+            ERRORS.inc(stage='upload')
+            return None
+
+        # Decode entirely in memory: the upload is piped into ffmpeg and
+        # 16kHz mono float32 PCM comes back on stdout (pydub/librosa fallbacks
+        # also work from in-memory buffers), so no temp WAV files are written
+        try:
+            y, sr = decode_audio(audio_bytes, fmt, sr=16000)
+        except DecodeError as e:
+            logger.error("All loading methods failed: %s", e)
+            ERRORS.inc(stage='decode')
+            return None
+        
+        if len(y) == 0:
+            logger.error("Audio file is empty or corrupted")
+            ERRORS.inc(stage='decode')
+            return None
+            
+        logger.debug("Audio loaded: %d samples at %d Hz", len(y), sr)
+        
+        # Extract features exactly like training script, sharing one STFT
+        # between MFCC, ZCR and spectral centroid
+        try:
+            with span('features'):
+                mfcc, zcr, spec_cent = frame_features(y, sr)
+                # Combine features in same order as training
+                features = summarize(mfcc, zcr, spec_cent)
+        except Exception:
+            ERRORS.inc(stage='features')
+            logger.exception("Error extracting audio features")
+            return None
+
+        logger.debug("Frame features: MFCC %s, ZCR %s, centroid %s -> %s",
+                     mfcc.shape, zcr.shape, spec_cent.shape, features.shape)
+        return features
+        
+    except Exception:
+        ERRORS.inc(stage='extract')
+        logger.exception("Error extracting features")
+        return None
@@ -0,0 +1,190 @@
+"""
+Content-hash cache for upload results.
+
+Entries are keyed by a SHA-256 of the uploaded bytes plus the model version and
+hold the 30-dim feature vector and the class probabilities, so a repeated
+upload skips decoding and feature extraction entirely. There is a size-bounded
+in-process LRU tier and an optional on-disk tier that gunicorn workers share,
+capped at `disk_max_entries` files (least recently used removed first).
+
+Streamed uploads are only hashed once their last byte is in, so each entry
+also records a key for the upload's first PREFIX_BYTES. An upload whose
+prefix has been seen before is read to the end and looked up before anything
+is decoded; any other upload is decoded while it streams in.
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PREFIX_BYTES = 64 * 1024
+
+# Disk writes between scans that prune the disk tier back under its cap
+PRUNE_EVERY = 64
+
+
+def content_key(data, model_version, digest=None):
+    """
+    Cache key for an upload scored by a particular model version; pass
+    `digest` (SHA-256 hex) instead of `data` for uploads hashed as they streamed in
+    """
+    return f"{model_version}-{digest or hashlib.sha256(data).hexdigest()}"
+
+
+def prefix_key(data, model_version):
+    """Key for the first PREFIX_BYTES of an upload (a hint that it may be cached, not a match)"""
+    return f"{model_version}-prefix-{hashlib.sha256(data[:PREFIX_BYTES]).hexdigest()}"
+
+
+class ResultCache:
+    def __init__(self, max_entries=1024, disk_dir=None, disk_max_entries=10000):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._disk_writes = 0
+        self._entries = OrderedDict()
+        self._prefixes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _prefix_path(self, prefix):
+        return os.path.join(self.disk_dir, f"{prefix}.prefix")
+
+    def _remember(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return (features, proba) for a cached upload, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key)) as f:
+                    raw = json.load(f)
+                entry = (np.asarray(raw['features']), np.asarray(raw['proba']))
+            except FileNotFoundError:
+                entry = None
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Ignoring unreadable cache entry {key}: {e}")
+                entry = None
+            if entry is not None:
+                try:
+                    # Pruning goes by mtime, so a hit keeps the entry on disk
+                    os.utime(self._disk_path(key))
+                except OSError:
+                    pass
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def seen_prefix(self, prefix):
+        """Whether an upload starting with this prefix has been cached"""
+        with self._lock:
+            if prefix in self._prefixes:
+                self._prefixes.move_to_end(prefix)
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._prefix_path(prefix))
+
+    def _remember_prefix(self, prefix):
+        with self._lock:
+            self._prefixes[prefix] = True
+            self._prefixes.move_to_end(prefix)
+            while len(self._prefixes) > max(self.max_entries, 0):
+                self._prefixes.popitem(last=False)
+
+    def put(self, key, features, proba, prefix=None):
+        entry = (np.asarray(features), np.asarray(proba))
+        self._remember(key, entry)
+        if prefix:
+            self._remember_prefix(prefix)
+
+        if self.disk_dir:
+            # Write-then-rename so other workers never see a half-written file
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'features': entry[0].tolist(), 'proba': entry[1].tolist()}, f)
+                os.replace(tmp_path, self._disk_path(key))
+                if prefix:
+                    open(self._prefix_path(prefix), 'a').close()
+            except OSError as e:
+                logger.error(f"Could not write cache entry {key}: {e}")
+            with self._lock:
+                self._disk_writes += 1
+                prune = self._disk_writes % PRUNE_EVERY == 1
+            if prune:
+                self.prune_disk()
+
+    def prune_disk(self):
+        """Remove the oldest disk entries (and prefix markers) beyond disk_max_entries"""
+        if not self.disk_dir or not self.disk_max_entries:
+            return
+        for suffix in ('.json', '.prefix'):
+            try:
+                paths = [entry.path for entry in os.scandir(self.disk_dir) if entry.name.endswith(suffix)]
+            except OSError as e:
+                logger.error(f"Could not scan cache directory {self.disk_dir}: {e}")
+                return
+            excess = len(paths) - self.disk_max_entries
+            if excess <= 0:
+                continue
+            ages = []
+            for path in paths:
+                try:
+                    ages.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass     # removed by another worker meanwhile
+            for _, path in sorted(ages)[:excess]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._prefixes.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_enabled': bool(self.disk_dir),
+                'disk_max_entries': self.disk_max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -21,6 +21,12 @@ document.addEventListener('DOMContentLoaded', function() {
     const useRecordingBtn = document.getElementById('use-recording-btn');
     const reRecordBtn = document.getElementById('re-record-btn');
     
+    // Live scoring elements
+    const liveBtn = document.getElementById('live-btn');
+    const liveStatus = document.getElementById('live-status');
+    const liveText = document.getElementById('live-text');
+    const liveLatency = document.getElementById('live-latency');
+    
     // Recording variables
     let mediaRecorder = null;
     let recordedChunks = [];
@@ -30,6 +36,20 @@ document.addEventListener('DOMContentLoaded', function() {
     let recordingInterval = null;
     let countdownTime = 3;
     let recordingTime = 5;
+    
+    // Live scoring variables
+    const LIVE_SAMPLE_RATE = 16000;
+    const LIVE_WINDOW_SECONDS = 2;
+    const LIVE_HOP_MS = 500;
+    let liveContext = null;
+    let liveProcessor = null;
+    let liveStream = null;
+    let liveBuffer = null;
+    let liveFilled = 0;
+    let liveInterval = null;
+    let liveInFlight = false;
+    let liveProbTotals = {};
+    let liveWindows = 0;
 
     // Initialize
     resetUI();
@@ -322,7 +342,113 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 5000);
     }
 
+    // Live scoring: keep a rolling 2s PCM buffer and post it every hop
+    async function startLive() {
+        try {
+            liveStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        } catch (error) {
+            console.error('Error accessing microphone:', error);
+            showError('Could not access microphone. Please check permissions.');
+            return;
+        }
+        
+        // Ask for 16kHz directly; browsers that can't resample report their own rate
+        try {
+            liveContext = new AudioContext({ sampleRate: LIVE_SAMPLE_RATE });
+        } catch (error) {
+            liveContext = new AudioContext();
+        }
+        const source = liveContext.createMediaStreamSource(liveStream);
+        liveProcessor = liveContext.createScriptProcessor(4096, 1, 1);
+        liveBuffer = new Float32Array(Math.round(liveContext.sampleRate * LIVE_WINDOW_SECONDS));
+        liveFilled = 0;
+        liveProbTotals = {};
+        liveWindows = 0;
+        
+        liveProcessor.onaudioprocess = function(event) {
+            const input = event.inputBuffer.getChannelData(0);
+            // Shift the rolling buffer left and append the newest samples
+            if (input.length >= liveBuffer.length) {
+                liveBuffer.set(input.subarray(input.length - liveBuffer.length));
+            } else {
+                liveBuffer.copyWithin(0, input.length);
+                liveBuffer.set(input, liveBuffer.length - input.length);
+            }
+            liveFilled = Math.min(liveBuffer.length, liveFilled + input.length);
+        };
+        source.connect(liveProcessor);
+        liveProcessor.connect(liveContext.destination);
+        
+        liveInterval = setInterval(sendLiveWindow, LIVE_HOP_MS);
+        
+        liveBtn.classList.add('active');
+        liveBtn.querySelector('.btn-text').textContent = 'Stop Live';
+        recordBtn.disabled = true;
+        liveStatus.style.display = 'flex';
+        liveText.textContent = 'Listening...';
+        liveLatency.textContent = '';
+    }
+
+    function sendLiveWindow() {
+        // Wait for a full window, and never queue requests behind a slow one
+        if (liveInFlight || liveFilled < liveBuffer.length) return;
+        liveInFlight = true;
+        const sentAt = performance.now();
+        
+        fetch(`/api/live/score?sr=${liveContext.sampleRate}&dtype=float32`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: liveBuffer.slice().buffer
+        })
+        .then(response => response.json())
+        .then(data => {
+            const latency = performance.now() - sentAt;
+            if (data.error) {
+                console.error('Live scoring error:', data.error);
+                return;
+            }
+            // Running verdict: average the per-window probabilities
+            (data.windows || []).forEach(w => {
+                Object.entries(w.probabilities).forEach(([label, p]) => {
+                    liveProbTotals[label] = (liveProbTotals[label] || 0) + p;
+                });
+                liveWindows++;
+            });
+            if (liveWindows > 0) {
+                const [label, total] = Object.entries(liveProbTotals).sort((a, b) => b[1] - a[1])[0];
+                const confidence = Math.round(total / liveWindows * 100);
+                liveText.textContent = `${label === 'Real' ? '✅ AUTHENTIC' : '❌ FAKE'} · ${confidence}%`;
+            }
+            liveLatency.textContent = `${Math.round(latency)} ms`;
+        })
+        .catch(error => console.error('Live scoring request failed:', error))
+        .finally(() => { liveInFlight = false; });
+    }
+
+    function stopLive() {
+        if (liveInterval) clearInterval(liveInterval);
+        if (liveProcessor) liveProcessor.disconnect();
+        if (liveContext) liveContext.close();
+        if (liveStream) liveStream.getTracks().forEach(track => track.stop());
+        liveInterval = null;
+        liveProcessor = null;
+        liveContext = null;
+        liveStream = null;
+        
+        liveBtn.classList.remove('active');
+        liveBtn.querySelector('.btn-text').textContent = 'Live';
+        recordBtn.disabled = false;
+        liveStatus.style.display = 'none';
+    }
+
     // Event listeners
+    liveBtn.addEventListener('click', function() {
+        if (liveContext) {
+            stopLive();
+        } else {
+            startLive();
+        }
+    });
     recordBtn.addEventListener('click', startRecording);
     stopBtn.addEventListener('click', stopRecording);
     useRecordingBtn.addEventListener('click', useRecording);
@@ -0,0 +1,133 @@
+"""
+Sliding-window streaming inference over long recordings.
+
+Training data is cut into 2 second chunks (scripts/audio_cutting.py), so
+scoring a whole upload as a single mean/std vector does not match what the
+model was trained on. Here decoded PCM blocks are cut into windows of the same
+length (with a configurable hop), each window is featurized and scored as soon
+as it is complete, and the per-window probabilities are folded into a running
+verdict. Only the current window is ever buffered, so peak memory does not
+grow with recording length.
+"""
+import numpy as np
+
+from feature_engine import SR, extract_feature_vector, extract_feature_batch
+
+WINDOW_SECONDS = 2.0
+HOP_SECONDS = 2.0
+
+# Windows quieter than this (dBFS RMS) carry no movement sound; the training
+# slicer trims silence before cutting chunks, so they are skipped here too
+MIN_WINDOW_DB = -60.0
+
+
+def sliding_windows(blocks, window, hop):
+    """
+    Re-block a stream of 1-D sample arrays into (start_sample, window) pairs.
+
+    A trailing partial window is only emitted when the stream was shorter than
+    one window, so short clips still get scored.
+    """
+    buf = np.empty(0, dtype=np.float32)
+    start = 0
+    skip = 0
+    emitted = False
+    for block in blocks:
+        if skip:
+            # hop > window: drop the gap between windows as it arrives
+            dropped = min(skip, len(block))
+            block = block[dropped:]
+            skip -= dropped
+            start += dropped
+        buf = np.concatenate([buf, block]) if len(buf) else np.asarray(block, dtype=np.float32)
+        while len(buf) >= window:
+            yield start, buf[:window]
+            emitted = True
+            advance = min(hop, len(buf))
+            skip = hop - advance
+            buf = buf[advance:]
+            start += advance
+    if not emitted and len(buf):
+        yield start, buf
+
+
+def window_db(y):
+    rms = np.sqrt(np.mean(np.square(y, dtype=np.float64)))
+    return 20 * np.log10(max(rms, 1e-10))
+
+
+class RunningVerdict:
+    """Accumulates per-window probabilities into an overall verdict"""
+
+    def __init__(self, classes):
+        self.classes = np.asarray(classes)
+        self.total = np.zeros(len(self.classes))
+        self.votes = np.zeros(len(self.classes), dtype=int)
+        self.windows = 0
+        self.skipped = 0
+
+    def update(self, proba):
+        self.total += proba
+        self.votes[np.argmax(proba)] += 1
+        self.windows += 1
+
+    @property
+    def mean_proba(self):
+        return self.total / self.windows if self.windows else None
+
+
+def score_windows(blocks, predict_proba, classes, sr=SR,
+                  window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS,
+                  min_window_db=MIN_WINDOW_DB, featurize=extract_feature_vector):
+    """
+    Featurize (with `featurize`, e.g. on a worker pool) and score each
+    window as it arrives.
+
+    Yields (start_seconds, end_seconds, proba, verdict) for every scored window;
+    `verdict` is the shared RunningVerdict, updated in place.
+    """
+    window = int(round(window_seconds * sr))
+    hop = max(1, int(round(hop_seconds * sr)))
+    verdict = RunningVerdict(classes)
+    for start, y in sliding_windows(blocks, window, hop):
+        if window_db(y) < min_window_db:
+            verdict.skipped += 1
+            continue
+        features = featurize(y, sr)
+        proba = predict_proba(features.reshape(1, -1))[0]
+        verdict.update(proba)
+        yield start / sr, (start + len(y)) / sr, proba, verdict
+
+
+def score_buffer(y, predict_proba, classes, sr=SR,
+                 window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS,
+                 min_window_db=MIN_WINDOW_DB, featurize_batch=extract_feature_batch):
+    """
+    Score a signal that is already fully in memory.
+
+    Same windows and verdict as score_windows, but every window is featurized
+    in one batch (by `featurize_batch`, e.g. on a worker pool) and scored
+    with one predict_proba call. Returns a list of (start_seconds,
+    end_seconds, proba) and the RunningVerdict.
+    """
+    window = int(round(window_seconds * sr))
+    hop = max(1, int(round(hop_seconds * sr)))
+    verdict = RunningVerdict(classes)
+    kept = []
+    for start, w in sliding_windows([y], window, hop):
+        if window_db(w) < min_window_db:
+            verdict.skipped += 1
+        else:
+            kept.append((start, w))
+    if not kept:
+        return [], verdict
+
+    # A clip shorter than one window is a batch of one partial window
+    X = featurize_batch(np.stack([w for _, w in kept]), sr)
+    proba = predict_proba(X)
+
+    results = []
+    for (start, w), p in zip(kept, proba):
+        verdict.update(p)
+        results.append((start / sr, (start + len(w)) / sr, p))
+    return results, verdict
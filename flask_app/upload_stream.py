@@ -0,0 +1,177 @@
+"""
+Streaming multipart uploads.
+
+Werkzeug's form parser reads the whole request body (spooling large files to
+a temp file) before a view can look at `request.files`, and the view then
+copies the upload again. Here the body is parsed incrementally with
+werkzeug's sans-IO MultipartDecoder straight from `request.stream`: the file
+part's bytes are yielded as they come off the socket, so they can be piped
+into the decoder while the client is still uploading.
+
+The body size cap is werkzeug's own MAX_CONTENT_LENGTH check on
+`request.stream` (RequestEntityTooLarge, raised before reading when the
+Content-Length is too big and mid-stream for chunked uploads);
+limit_duration() caps the decoded audio.
+"""
+import hashlib
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NEED_DATA
+
+CHUNK_SIZE = 64 * 1024
+
+# Text fields sent ahead of the file part (e.g. window/hop) are kept, up to this size
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """The request body is not a well-formed multipart upload"""
+
+
+class AudioTooLong(Exception):
+    """The decoded upload is longer than the configured duration cap"""
+
+
+class _MultipartReader:
+    """Feeds a MultipartDecoder from the request stream on demand"""
+
+    def __init__(self, stream, boundary):
+        self.stream = stream
+        self.decoder = MultipartDecoder(boundary)
+        self.eof = False
+
+    def next_event(self):
+        try:
+            while True:
+                event = self.decoder.next_event()
+                if event is not NEED_DATA:
+                    return event
+                if self.eof:
+                    raise UploadError("Request body ended in the middle of the upload")
+                data = self.stream.read(CHUNK_SIZE)
+                self.eof = not data
+                self.decoder.receive_data(data or None)
+        except ValueError as e:
+            # MultipartDecoder's complaints about a malformed body
+            raise UploadError(str(e)) from e
+
+
+class StreamedUpload:
+    """
+    One file part of a multipart request, read as it arrives.
+
+    Iterate chunks() to consume the part (any thread may do this, e.g.
+    ffmpeg's stdin feeder). An error raised while reading is also kept in
+    `error`, so a consumer on another thread can re-raise it. With
+    keep=True the bytes are retained for read(), which finishes the part
+    and returns the whole upload. head() reads ahead without consuming.
+    """
+
+    def __init__(self, reader, filename, content_type, form, keep=False):
+        self.filename = filename
+        self.content_type = content_type
+        self.form = form
+        self.size = 0
+        self.complete = False
+        self.error = None
+        self._reader = reader
+        self._sha256 = hashlib.sha256()
+        self._kept = [] if keep else None
+        self._pending = []
+
+    def chunks(self):
+        # Anything head() read ahead comes out first
+        while self._pending:
+            yield self._pending.pop(0)
+        yield from self._read()
+
+    def _read(self):
+        try:
+            while not self.complete:
+                event = self._reader.next_event()
+                if not isinstance(event, Data):
+                    # The next part or the epilogue: the file part is over
+                    self.complete = True
+                    break
+                self.complete = not event.more_data
+                if event.data:
+                    self.size += len(event.data)
+                    self._sha256.update(event.data)
+                    if self._kept is not None:
+                        self._kept.append(event.data)
+                    yield event.data
+        except Exception as e:
+            self.error = e
+            raise
+
+    def head(self, n):
+        """
+        The first n bytes of the upload (all of it if shorter), read ahead
+        of chunks(), which still yields them
+        """
+        have = sum(map(len, self._pending))
+        if have < n:
+            for data in self._read():
+                self._pending.append(data)
+                have += len(data)
+                if have >= n:
+                    break
+        return b''.join(self._pending)[:n]
+
+    def finish(self):
+        """Read whatever part of the upload has not been consumed yet"""
+        for _ in self.chunks():
+            pass
+
+    def read(self):
+        """The whole upload; needs keep=True"""
+        self.finish()
+        return b''.join(self._kept)
+
+    def hexdigest(self):
+        """SHA-256 of the whole upload"""
+        self.finish()
+        return self._sha256.hexdigest()
+
+
+def open_upload(stream, content_type, field='file', keep=False):
+    """
+    Read a multipart body up to the start of the `field` file part and
+    return it as a StreamedUpload, or None if the body has no such part.
+    Text fields before it end up in `form`. Raises UploadError for a
+    malformed body.
+    """
+    mimetype, options = parse_options_header(content_type or '')
+    if mimetype != 'multipart/form-data' or not options.get('boundary'):
+        return None
+
+    reader = _MultipartReader(stream, options['boundary'].encode('latin-1'))
+    form = {}
+    current, value = None, []
+    while True:
+        event = reader.next_event()
+        if isinstance(event, File) and event.name == field:
+            return StreamedUpload(reader, event.filename or '', event.headers.get('Content-Type'), form, keep=keep)
+        if isinstance(event, Field):
+            current, value = event.name, []
+        elif isinstance(event, File):
+            current = None      # some other file part: skip its data
+        elif isinstance(event, Data) and current is not None:
+            value.append(event.data)
+            if sum(map(len, value)) > MAX_FIELD_BYTES:
+                raise UploadError(f"Form field '{current}' is too large")
+            if not event.more_data:
+                form[current] = b''.join(value).decode('utf-8', errors='replace')
+        elif isinstance(event, Epilogue):
+            return None
+
+
+def limit_duration(blocks, max_seconds, sr):
+    """Pass PCM blocks through, raising AudioTooLong once more than max_seconds have arrived"""
+    max_samples = int(max_seconds * sr)
+    total = 0
+    for block in blocks:
+        total += len(block)
+        if total > max_samples:
+            raise AudioTooLong(f"Audio is longer than {max_seconds:g} seconds")
+        yield block
@@ -1,53 +1,270 @@
-from pydub import AudioSegment, effects, silence
+"""
+Streaming slicer: turns long source recordings into 2 second training chunks.
+
+Each source file is decoded block by block with ffmpeg (16 kHz mono float32),
+peak-normalized, stripped of silence with a vectorized RMS detector, and cut
+into fixed-length WAV chunks as the audio streams through. Memory is bounded by
+one decode block plus one chunk, regardless of recording length, and many
+source files are processed concurrently.
+
+Silence detection mirrors the original pydub pipeline
+(effects.normalize + silence.detect_nonsilent(min_silence_len=300,
+silence_thresh=-40)): any 300 ms window whose RMS is below -40 dBFS after
+normalization is silence. Windows are evaluated on a 10 ms grid rather than
+pydub's 1 ms seek step, so range edges can differ by up to 10 ms.
+
+Usage:
+    python scripts/audio_cutting.py [--input audio_samples] [--output data] [--workers N]
+
+Labels come from a `real`/`fake` subdirectory of the input directory, or else
+from "real"/"fake" appearing in the file name.
+"""
 import os
+import re
+import sys
+import wave
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from audio_decoder import iter_decode_file
 
 # Define base directories relative to current file
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 AUDIO_INPUT_DIR = os.path.join(BASE_DIR, "audio_samples")
 OUTPUT_BASE_DIR = os.path.join(BASE_DIR, "data")
 
-def preprocess_audio(audio: AudioSegment):
-    #   Convert to mono
-    audio = audio.set_channels(1)
+SR = 16000
+LABELS = ('real', 'fake')
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.m4a', '.flac', '.ogg', '.webm'}
+
+# pydub's effects.normalize default headroom
+NORMALIZE_HEADROOM_DB = 0.1
+
+
+def peak_gain(path):
+    """First pass: the gain that peak-normalizes the file like effects.normalize"""
+    peak = 0.0
+    for block in iter_decode_file(path, sr=SR):
+        if len(block):
+            peak = max(peak, float(np.max(np.abs(block))))
+    if peak == 0.0:
+        return 1.0
+    return 10 ** (-NORMALIZE_HEADROOM_DB / 20) / peak
+
+
+class SilenceTrimmer:
+    """
+    Streaming, vectorized equivalent of pydub.silence.detect_nonsilent followed
+    by concatenating the non-silent ranges.
+
+    Samples are grouped into 10 ms frames. Window s (min_silence_ms long,
+    starting at frame s) is silent when its RMS is below the threshold, and a
+    frame is dropped when any complete silent window covers it. A frame is
+    final once every window that could cover it has been seen, so only about
+    min_silence_ms of audio is ever held back.
+    """
+
+    def __init__(self, sr=SR, gain=1.0, min_silence_ms=300, silence_thresh_db=-40, frame_ms=10):
+        self.gain = gain
+        self.frame = int(sr * frame_ms / 1000)
+        self.win = max(1, int(round(min_silence_ms / frame_ms)))
+        # Silent when mean square of the window is below thresh^2
+        self.max_energy = (10 ** (silence_thresh_db / 20)) ** 2 * self.win * self.frame
+
+        self.pending = np.empty(0, dtype=np.float32)          # samples not yet framed
+        self.frames = np.empty((0, self.frame), np.float32)   # frames [f0, n)
+        self.energies = np.empty(0)                           # energies [s0, n)
+        self.flags = np.empty(0, dtype=bool)                  # silent windows [wbase, s0)
+        self.n = 0        # frames seen
+        self.f0 = 0       # next frame to finalize
+        self.s0 = 0       # next window start to evaluate
+        self.wbase = 0    # window index of flags[0]
+        self.kept = 0     # non-silent samples emitted
+
+    def _finalize(self, upto):
+        """Emit non-silent samples for frames [f0, upto) using windows < s0"""
+        count = upto - self.f0
+        if count <= 0:
+            return np.empty(0, dtype=np.float32)
+        f = np.arange(self.f0, upto)
+        lo = np.maximum(f - self.win + 1, self.wbase) - self.wbase
+        hi = np.minimum(f, self.s0 - 1) - self.wbase + 1
+        cum = np.concatenate([[0], np.cumsum(self.flags)])
+        silent = (cum[np.maximum(hi, lo)] - cum[lo]) > 0
+
+        kept = self.frames[:count][~silent].ravel() * self.gain
+        self.frames = self.frames[count:]
+        self.f0 = upto
+        # Windows starting before f0 - win + 1 can no longer cover any frame
+        new_base = max(0, self.f0 - self.win + 1)
+        self.flags = self.flags[new_base - self.wbase:]
+        self.wbase = new_base
+        self.kept += len(kept)
+        return kept.astype(np.float32, copy=False)
+
+    def push(self, samples):
+        samples = np.concatenate([self.pending, samples]) if len(self.pending) else samples
+        k = len(samples) // self.frame
+        self.pending = samples[k * self.frame:].copy()
+        if k == 0:
+            return np.empty(0, dtype=np.float32)
+
+        new_frames = samples[:k * self.frame].reshape(k, self.frame)
+        energy = np.einsum('ij,ij->i', new_frames, new_frames, dtype=np.float64) * self.gain ** 2
+        self.frames = np.concatenate([self.frames, new_frames])
+        self.energies = np.concatenate([self.energies, energy])
+        self.n += k
+
+        # Evaluate every complete window that now fits
+        ready = self.n - self.win - self.s0 + 1
+        if ready > 0:
+            cum = np.concatenate([[0], np.cumsum(self.energies)])
+            window_energy = cum[self.win:self.win + ready] - cum[:ready]
+            self.flags = np.concatenate([self.flags, window_energy < self.max_energy])
+            self.s0 += ready
+            self.energies = self.energies[ready:]
+
+        # Frame f is final once all windows starting at <= f are known
+        return self._finalize(self.s0)
 
-    #   Normalize volume
-    audio = effects.normalize(audio)
+    def flush(self):
+        # Trailing frames are only covered by the windows already evaluated;
+        # the sub-frame remainder (< 10 ms) is dropped
+        return self._finalize(self.n)
 
-    #   Trim silence using detect_nonsilent
-    nonsilent_ranges = silence.detect_nonsilent(audio, min_silence_len=300, silence_thresh=-40)
 
-    if not nonsilent_ranges:
-        return audio  # return as-is if no nonsilent parts found
+class Chunker:
+    """Re-blocks a stream of samples into fixed-length chunks"""
 
-    #   Merge all nonsilent parts
-    trimmed_audio = AudioSegment.empty()
-    for start, end in nonsilent_ranges:
-        trimmed_audio += audio[start:end]
+    def __init__(self, sr=SR, chunk_length_ms=2000):
+        self.chunk = int(sr * chunk_length_ms / 1000)
+        self.buf = np.empty(0, dtype=np.float32)
 
-    #   Resample to 16kHz for ML
-    trimmed_audio = trimmed_audio.set_frame_rate(16000)
+    def push(self, samples):
+        if not len(samples):
+            return []
+        self.buf = np.concatenate([self.buf, samples])
+        full = len(self.buf) // self.chunk
+        chunks = [self.buf[i * self.chunk:(i + 1) * self.chunk] for i in range(full)]
+        self.buf = self.buf[full * self.chunk:]
+        return chunks
 
-    return trimmed_audio
+    def close(self):
+        # The last, shorter chunk is kept, as before
+        tail, self.buf = self.buf, np.empty(0, dtype=np.float32)
+        return [tail] if len(tail) else []
 
 
-def slice_audio(filename, label, chunk_length_ms=2000):
-    input_path = os.path.join(AUDIO_INPUT_DIR, filename)
+def write_wav(path, samples, sr=SR):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+
+
+def chunk_prefix(input_path, label):
+    stem = re.sub(r'[^A-Za-z0-9]+', '_', os.path.splitext(os.path.basename(input_path))[0]).strip('_').lower()
+    return f"{label}_{stem}"
+
+
+def iter_chunks(input_path, chunk_length_ms=2000, min_silence_ms=300, silence_thresh_db=-40, stats=None):
+    """
+    Yield the normalized, silence-trimmed chunks of one recording as float32
+    arrays, decoding block by block. If `stats` is a dict, the number of
+    decoded source samples is stored in stats['decoded_samples'].
+    """
+    gain = peak_gain(input_path)
+    trimmer = SilenceTrimmer(gain=gain, min_silence_ms=min_silence_ms, silence_thresh_db=silence_thresh_db)
+    chunker = Chunker(chunk_length_ms=chunk_length_ms)
+    decoded = 0
+    for block in iter_decode_file(input_path, sr=SR):
+        decoded += len(block)
+        yield from chunker.push(trimmer.push(block))
+    yield from chunker.push(trimmer.flush())
+
+    if trimmer.kept == 0:
+        # No non-silent parts found: keep the whole recording, as pydub did
+        for block in iter_decode_file(input_path, sr=SR):
+            yield from chunker.push(block * gain)
+    yield from chunker.close()
+
+    if stats is not None:
+        stats['decoded_samples'] = decoded
+
+
+def slice_audio(input_path, label, output_base_dir=OUTPUT_BASE_DIR, chunk_length_ms=2000,
+                min_silence_ms=300, silence_thresh_db=-40):
     print(f" Processing: {input_path}")
 
     if not os.path.exists(input_path):
         print(f" File not found: {input_path}")
-        return
-
-    audio = AudioSegment.from_file(input_path)
-    audio = preprocess_audio(audio)
+        return 0
 
-    output_dir = os.path.join(OUTPUT_BASE_DIR, label)
+    output_dir = os.path.join(output_base_dir, label)
     os.makedirs(output_dir, exist_ok=True)
+    prefix = chunk_prefix(input_path, label)
+
+    written = 0
+    for chunk in iter_chunks(input_path, chunk_length_ms, min_silence_ms, silence_thresh_db):
+        write_wav(os.path.join(output_dir, f"{prefix}_{written}.wav"), chunk)
+        written += 1
+    return written
+
+
+def label_for(path, input_dir):
+    """Label from a real/fake subdirectory, else from the file name"""
+    parts = os.path.relpath(path, input_dir).lower().split(os.sep)
+    for part in parts[:-1]:
+        if part in LABELS:
+            return part
+    name = parts[-1]
+    matches = [label for label in LABELS if label in name]
+    return matches[0] if len(matches) == 1 else None
+
+
+def find_sources(input_dir):
+    sources = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                path = os.path.join(root, name)
+                label = label_for(path, input_dir)
+                if label is None:
+                    print(f" Skipping (can't tell real/fake from path): {path}")
+                else:
+                    sources.append((path, label))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice source recordings into training chunks")
+    parser.add_argument('--input', default=AUDIO_INPUT_DIR, help="Directory of source recordings")
+    parser.add_argument('--output', default=OUTPUT_BASE_DIR, help="Output directory (chunks go to <output>/<label>/)")
+    parser.add_argument('--chunk-ms', type=int, default=2000)
+    parser.add_argument('--min-silence-ms', type=int, default=300)
+    parser.add_argument('--silence-thresh', type=float, default=-40, help="dBFS after normalization")
+    parser.add_argument('--workers', type=int, default=None, help="Files processed concurrently (default: all cores)")
+    args = parser.parse_args()
+
+    sources = find_sources(args.input)
+    if not sources:
+        print(f" No source recordings found in {args.input}")
+        return
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(slice_audio, path, label, args.output, args.chunk_ms,
+                            args.min_silence_ms, args.silence_thresh): path
+            for path, label in sources
+        }
+        for future in as_completed(futures):
+            print(f" {futures[future]}: {future.result()} chunks")
 
-    for i in range(0, len(audio), chunk_length_ms):
-        chunk = audio[i:i + chunk_length_ms]
-        chunk.export(os.path.join(output_dir, f"{label}_{i // chunk_length_ms}.wav"), format="wav")
 
-#  Process both real and fake
-slice_audio("Real Submariner Date Movement (1).m4a", "real")
-slice_audio("Fake Submariner Date Movement (1).m4a", "fake")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark for the web app.
+
+For each STARTUP_MODE, starts a fresh server process and measures, from the
+moment the process is spawned:
+  - time to first byte of GET /health
+  - time to the first successful prediction (POST /api/predict/batch with a
+    synthetic 2 second WAV)
+and prints the import/model-load timings the app reports in /health.
+
+Usage:
+    python scripts/bench_cold_start.py [--modes eager,lazy,background] [--port 5055]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+
+import numpy as np
+
+FLASK_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app')
+
+SERVER_CMD = (
+    "import sys; sys.path.insert(0, {dir!r}); "
+    "from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+)
+
+
+def synthetic_wav(seconds=2.0, sr=16000):
+    t = np.arange(int(seconds * sr)) / sr
+    y = (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(y.tobytes())
+    return buf.getvalue()
+
+
+def multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: audio/wav\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def first_byte(url, spawned, timeout, data=None, content_type=None):
+    """Retry until the server answers; returns (seconds since spawn, body)"""
+    deadline = spawned + timeout
+    while time.perf_counter() < deadline:
+        request = urllib.request.Request(url, data=data)
+        if content_type:
+            request.add_header('Content-Type', content_type)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                first = response.read(1)
+                elapsed = time.perf_counter() - spawned
+                return elapsed, first + response.read()
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{url} returned HTTP {e.code}: {e.read()[:200]!r}")
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.02)
+    raise TimeoutError(f"No response from {url} within {timeout}s")
+
+
+def run_mode(mode, port, timeout):
+    env = dict(os.environ, STARTUP_MODE=mode)
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-c', SERVER_CMD.format(dir=FLASK_APP_DIR, port=port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f'http://127.0.0.1:{port}'
+    try:
+        health_ttfb, _ = first_byte(f'{base}/health', spawned, timeout)
+        body, content_type = multipart('files', 'bench.wav', synthetic_wav())
+        prediction_s, _ = first_byte(f'{base}/api/predict/batch', spawned, timeout, body, content_type)
+        _, health = first_byte(f'{base}/health', spawned, timeout)
+        timings = json.loads(health).get('startup_timings', {})
+        return health_ttfb, prediction_s, timings
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='eager,lazy,background')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    for mode in args.modes.split(','):
+        health_ttfb, prediction_s, timings = run_mode(mode, args.port, args.timeout)
+        print(f"{mode:>10}: /health TTFB {health_ttfb:6.2f}s | first prediction {prediction_s:6.2f}s")
+        for name, seconds in sorted(timings.items()):
+            print(f"{'':>12}{name}: {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Feature-pipeline throughput of the web app's CPU executor from 1 to N workers.
+
+For each worker count, featurizes a fixed number of clips per worker through
+cpu_pool.CpuPool (the same pipeline.extract_features the batch and job
+endpoints submit) and reports clips per second, speedup over one worker and
+parallel efficiency (speedup / workers). Each configuration is run with
+BLAS/OpenMP pinned to one thread per worker (CPU_THREADS=1, the app default)
+and unpinned, to show the oversubscription the pinning avoids once workers x
+native threads exceeds the cores.
+
+Usage:
+    python scripts/bench_cpu_pool.py [--max-workers N] [--seconds 10] [--clips-per-worker 8]
+                                     [--modes process,thread]
+"""
+import io
+import os
+import sys
+import time
+import wave
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from cpu_pool import CpuPool
+from pipeline import extract_features
+
+
+def clip_wav(seconds, sr=16000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * rng.uniform(200, 4000) * t) + 0.05 * rng.normal(size=len(t))
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((y * 32767).astype('<i2').tobytes())
+    return buf.getvalue()
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def throughput(pool, clips):
+    # One round per worker first: process start-up, imports and warm caches
+    pool.run_all([(extract_features, (clip, 'wav')) for clip in clips[:pool.workers]])
+    started = time.perf_counter()
+    results = pool.run_all([(extract_features, (clip, 'wav')) for clip in clips])
+    elapsed = time.perf_counter() - started
+    assert all(r is not None for r in results), "feature extraction failed"
+    return len(clips) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seconds', type=float, default=10, help="Length of each clip")
+    parser.add_argument('--clips-per-worker', type=int, default=8)
+    parser.add_argument('--modes', default='process,thread')
+    args = parser.parse_args()
+
+    counts = worker_counts(args.max_workers)
+    clips = [clip_wav(args.seconds, seed=i) for i in range(args.clips_per_worker * counts[-1])]
+    print(f"{os.cpu_count()} cores, {args.seconds:g}s clips, {args.clips_per_worker} clips per worker")
+    print(f"{'mode':<8} {'native threads':<15} {'workers':>7} {'clips/s':>9} {'speedup':>8} {'efficiency':>10}")
+
+    for mode in args.modes.split(','):
+        for threads, label in [(1, 'pinned (1)'), (None, 'unpinned')]:
+            if mode == 'thread' and threads is None:
+                # Thread mode caps the whole web process; unpinned is just the numpy default
+                continue
+            base = None
+            for workers in counts:
+                pool = CpuPool(mode, workers, threads)
+                try:
+                    rate = throughput(pool, clips[:args.clips_per_worker * workers])
+                finally:
+                    pool.shutdown(wait=True)
+                base = base or rate
+                speedup = rate / base
+                print(f"{mode:<8} {label:<15} {workers:>7} {rate:>9.1f} {speedup:>7.2f}x {speedup / workers:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Check and time the Numba feature kernels against the librosa path.
+
+For a batch of 2 second windows, compares extract_feature_batch (batched STFT
++ Numba kernels, and its NumPy fallback) with extract_feature_vector per
+window and with the individual librosa.feature calls the features are defined
+by, then reports the first-call time (kernel JIT or on-disk cache load) and
+steady-state throughput of all three paths.
+
+Usage:
+    python scripts/bench_feature_kernels.py [--windows 64]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from feature_engine import SR, N_FFT, HOP_LENGTH, N_MFCC, extract_feature_vector, extract_feature_batch
+import feature_kernels
+
+
+def librosa_vector(y):
+    """The 30-dim vector from the separate librosa feature calls"""
+    import librosa
+
+    mfcc = librosa.feature.mfcc(y=y, sr=SR, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    zcr = librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    cent = librosa.feature.spectral_centroid(y=y, sr=SR, n_fft=N_FFT, hop_length=HOP_LENGTH)[0]
+    return np.hstack([mfcc.mean(axis=1), mfcc.std(axis=1), zcr.mean(), zcr.std(), cent.mean(), cent.std()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--windows', type=int, default=64)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    t = np.arange(2 * SR) / SR
+    windows = np.stack([
+        (0.3 * np.sin(2 * np.pi * rng.uniform(100, 4000) * t) + 0.05 * rng.normal(size=len(t)))
+        for _ in range(args.windows)
+    ]).astype(np.float32)
+    windows[0, :4000] = 0.0  # silent stretch: exercises the ZCR threshold and centroid guard
+
+    started = time.perf_counter()
+    batch = extract_feature_batch(windows)
+    first_call = time.perf_counter() - started
+    numpy_batch = extract_feature_batch(windows, kernels=False)
+
+    single = np.array([extract_feature_vector(w) for w in windows])
+    reference = np.array([librosa_vector(w) for w in windows])
+    for path, result in [("batch + kernels", batch), ("NumPy batch", numpy_batch)]:
+        for name, other in [("extract_feature_vector", single), ("librosa.feature", reference)]:
+            np.testing.assert_allclose(result[:, 2 * N_MFCC:2 * N_MFCC + 2], other[:, 2 * N_MFCC:2 * N_MFCC + 2],
+                                       rtol=0, atol=1e-12, err_msg=f"{path}: ZCR differs from {name}")
+            np.testing.assert_allclose(result, other, rtol=1e-4, atol=1e-3,
+                                       err_msg=f"{path}: features differ from {name}")
+            print(f"✓ {path} matches {name}: max abs diff {np.max(np.abs(result - other)):.2e}, "
+                  f"max rel diff {np.max(np.abs(result - other) / np.maximum(np.abs(other), 1e-12)):.2e}")
+
+    def per_window(fn, repeats=3):
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+        return min(times) / len(windows)
+
+    single_s = per_window(lambda: [extract_feature_vector(w) for w in windows])
+    numpy_s = per_window(lambda: extract_feature_batch(windows, kernels=False))
+    batch_s = per_window(lambda: extract_feature_batch(windows))
+    kernel_s = per_window(lambda: feature_kernels.zcr_batch(windows, N_FFT, HOP_LENGTH, np.float32(1e-10)))
+    print(f"First batch call (JIT or cache load + warm-up): {first_call * 1e3:.1f} ms")
+    print(f"  per window: extract_feature_vector {single_s * 1e3:.2f} ms | NumPy batch {numpy_s * 1e3:.2f} ms "
+          f"({single_s / numpy_s:.1f}x) | batch + kernels {batch_s * 1e3:.2f} ms ({single_s / batch_s:.1f}x) "
+          f"| ZCR kernel alone {kernel_s * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark the binary feature store against the legacy dataset.csv.
+
+Writes the same synthetic feature table both ways into a temp directory and
+reports file size and load time (CSV via pandas.read_csv + label mapping,
+store via memory-mapped .npy, including one full pass over the data).
+
+Usage:
+    python scripts/bench_feature_store.py [--rows 100000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from feature_engine import FEATURE_NAMES
+from feature_store import FeatureStore
+
+
+def dir_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def best_of(fn, repeats=3):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(args.rows, len(FEATURE_NAMES))) * 100
+    labels = rng.choice(['real', 'fake'], size=args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'dataset.csv')
+        df = pd.DataFrame(X, columns=FEATURE_NAMES)
+        df['label'] = labels
+        df.to_csv(csv_path, index=False)
+
+        store = FeatureStore(os.path.join(tmp, 'store'))
+        store.append(X, labels, FEATURE_NAMES)
+
+        def load_csv():
+            df = pd.read_csv(csv_path)
+            df['label'] = df['label'].map({'real': 1, 'fake': 0})
+            return df.drop('label', axis=1).values.sum()
+
+        def load_store():
+            X, y, _ = store.load()
+            return X.sum(dtype=np.float64)
+
+        csv_size = os.path.getsize(csv_path)
+        store_size = dir_size(store.root)
+        csv_time = best_of(load_csv)
+        store_time = best_of(load_store)
+
+    print(f"Rows: {args.rows} x {len(FEATURE_NAMES)} features")
+    print(f"  CSV:   {csv_size / 1e6:8.2f} MB  load {csv_time * 1e3:8.1f} ms")
+    print(f"  Store: {store_size / 1e6:8.2f} MB  load {store_time * 1e3:8.1f} ms")
+    print(f"  {csv_size / store_size:.1f}x smaller, {csv_time / store_time:.1f}x faster to load")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare sklearn predict_proba with the compiled NumPy forest.
+
+Checks that both return identical probabilities and reports single-row and
+batch latency for each.
+
+Usage:
+    python scripts/bench_inference.py [model.pkl]
+"""
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from forest_compiler import compile_model
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'rolex_model.pkl')
+
+
+def time_per_call(fn, X, repeats):
+    fn(X)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(X)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    model = joblib.load(model_path)
+    compiled = compile_model(model)
+    print(f"Model: {model_path}")
+    print(f"Compiled: {compiled.n_trees} trees, {len(compiled.feature)} nodes, max depth {compiled.max_depth}")
+
+    rng = np.random.default_rng(0)
+    X_batch = rng.normal(size=(1000, compiled.n_features_in_))
+    np.testing.assert_array_equal(compiled.predict_proba(X_batch), model.predict_proba(X_batch))
+    print("✓ Probabilities identical on 1000 random rows")
+
+    X_row = X_batch[:1]
+    for name, fn in [("sklearn", model.predict_proba), ("compiled", compiled.predict_proba)]:
+        row = time_per_call(fn, X_row, 200)
+        batch = time_per_call(fn, X_batch, 10)
+        print(f"{name:>9}: single row {row * 1e6:9.1f} µs | batch of 1000 {batch * 1e3:8.2f} ms "
+              f"({batch / len(X_batch) * 1e6:.2f} µs/row)")
+
+
+if __name__ == "__main__":
+    main()
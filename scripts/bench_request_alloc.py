@@ -0,0 +1,97 @@
+"""
+Per-request memory allocation of the prediction endpoints.
+
+Drives the Flask app in-process with its test client and uses tracemalloc
+(NumPy reports its buffers to it) to measure, per request, the peak memory
+allocated above the baseline and what is still held afterwards. The result
+cache is disabled so every request decodes and featurizes.
+
+Cases cover the direct paths (16 kHz mono WAV, 16 kHz float32 live PCM) and
+the ones that need conversion (44.1 kHz stereo WAV through ffmpeg, 48 kHz
+int16 live PCM through the float32 polyphase resampler).
+
+Usage:
+    python scripts/bench_request_alloc.py [--seconds 10] [--requests 5]
+"""
+import io
+import os
+import sys
+import wave
+import argparse
+import tracemalloc
+
+import numpy as np
+
+os.environ.setdefault('RESULT_CACHE_SIZE', '0')
+os.environ.setdefault('STARTUP_MODE', 'eager')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from app import app
+
+
+def tone(seconds, sr, channels=1):
+    t = np.arange(int(seconds * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.01 * np.random.default_rng(0).normal(size=len(t))
+    return np.repeat(y[:, np.newaxis], channels, axis=1)
+
+
+def wav_bytes(seconds, sr, channels=1):
+    pcm = (tone(seconds, sr, channels) * 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def cases(seconds):
+    wav16 = wav_bytes(seconds, 16000)
+    wav44 = wav_bytes(seconds, 44100, channels=2)
+    # Live requests are capped at LIVE_MAX_SECONDS
+    live_seconds = min(seconds, 10)
+    live32 = tone(live_seconds, 16000)[:, 0].astype('<f4').tobytes()
+    live16 = (tone(live_seconds, 48000)[:, 0] * 32767).astype('<i2').tobytes()
+    return [
+        ("batch  wav 16k mono", lambda c: c.post(
+            '/api/predict/batch', data={'files': (io.BytesIO(wav16), 'a.wav')}), len(wav16)),
+        ("batch  wav 44.1k stereo", lambda c: c.post(
+            '/api/predict/batch', data={'files': (io.BytesIO(wav44), 'a.wav')}), len(wav44)),
+        ("live   f32 16k", lambda c: c.post(
+            '/api/live/score?sr=16000&dtype=float32', data=live32), len(live32)),
+        ("live   i16 48k", lambda c: c.post(
+            '/api/live/score?sr=48000&dtype=int16', data=live16), len(live16)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--requests', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'case':<24} {'upload':>9} {'peak/request':>13} {'retained':>10}")
+    for name, send, size in cases(args.seconds):
+        response = send(client)  # warm up: imports, filter design, mel basis
+        if response.status_code != 200:
+            print(f"{name:<24} HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            continue
+
+        tracemalloc.start()
+        peaks = []
+        baseline = tracemalloc.get_traced_memory()[0]
+        for _ in range(args.requests):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            send(client)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        print(f"{name:<24} {size / 1e6:7.2f}MB {np.median(peaks) / 1e6:11.2f}MB "
+              f"{retained / 1e3 / args.requests:8.1f}kB")
+
+
+if __name__ == "__main__":
+    main()
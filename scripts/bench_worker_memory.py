@@ -0,0 +1,127 @@
+"""
+Per-worker memory of the gunicorn deployment, before and after model sharing.
+
+For each worker count, starts gunicorn twice from the project root:
+  before - no --preload, MODEL_MMAP=0: every worker imports sklearn and
+           unpickles the model itself
+  after  - --preload, MODEL_MMAP=1: the master loads the memory-mapped
+           compiled forest once and the workers share it copy-on-write
+then sends enough predictions for every worker to have served one, and reads
+each worker's RSS and PSS from /proc/<pid>/smaps_rollup. PSS splits shared
+pages between the processes sharing them, so the PSS sum is the real memory
+the workers cost together. Linux only; needs gunicorn and a compiled forest
+next to the pickle the app serves: the active registry version's
+model.forest, or else flask_app/model/rolex_model.forest (python
+flask_app/forest_compiler.py flask_app/model/rolex_model.pkl). The script
+exits before starting anything when that export is missing or stale.
+
+Usage:
+    python scripts/bench_worker_memory.py [--workers 2,4,8] [--port 5056]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from bench_cold_start import first_byte, multipart, synthetic_wav
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Where the app looks for a registry and, without one, the pickle (app.find_model_path order)
+REGISTRY_DIRS = [os.path.join(PROJECT_DIR, 'flask_app', 'model', 'registry'), os.path.join(PROJECT_DIR, 'model', 'registry')]
+MODEL_PATHS = [os.path.join(PROJECT_DIR, 'flask_app', 'model', 'rolex_model.pkl'),
+               os.path.join(PROJECT_DIR, 'model', 'rolex_model.pkl')]
+
+CONFIGS = {
+    'before': ([], '0'),
+    'after': (['--preload'], '1'),
+}
+
+
+def served_model_path():
+    """The pickle the app will load, mirroring its registry-then-model-file lookup"""
+    registry_dir = os.environ.get('MODEL_REGISTRY_DIR') or next(
+        (path for path in REGISTRY_DIRS if os.path.isdir(path)), REGISTRY_DIRS[-1])
+    try:
+        with open(os.path.join(registry_dir, 'CURRENT')) as f:
+            version = f.read().strip()
+        if version:
+            return os.path.join(registry_dir, version, 'model.pkl')
+    except FileNotFoundError:
+        pass
+    return next((path for path in MODEL_PATHS if os.path.exists(path)), None)
+
+
+def check_compiled_export():
+    """Exit unless the 'after' runs will really serve a memory-mapped forest"""
+    model_path = served_model_path()
+    if model_path is None or not os.path.exists(model_path):
+        sys.exit(f"No model to serve (looked for {model_path or ' and '.join(MODEL_PATHS)})")
+    compiled_path = os.path.splitext(model_path)[0] + '.forest'
+    if not os.path.isdir(compiled_path) or os.path.getmtime(compiled_path) < os.path.getmtime(model_path):
+        sys.exit(f"{compiled_path} is missing or older than {model_path}; export it with "
+                 f"python flask_app/forest_compiler.py {os.path.relpath(model_path, PROJECT_DIR)}")
+    return compiled_path
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory_kb(pid):
+    """(RSS, PSS) in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def run(config, workers, port, timeout):
+    extra_args, mmap = CONFIGS[config]
+    env = dict(os.environ, MODEL_MMAP=mmap, STARTUP_MODE='eager')
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--timeout', '120', *extra_args],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f'http://127.0.0.1:{port}'
+    try:
+        first_byte(f'{base}/health', spawned, timeout)
+        # Requests are spread over workers by the kernel; a few per worker
+        # makes it very likely every worker has run a prediction
+        body, content_type = multipart('files', 'bench.wav', synthetic_wav())
+        for _ in range(4 * workers):
+            first_byte(f'{base}/api/predict/batch', time.perf_counter(), timeout, body, content_type)
+        pids = worker_pids(server.pid)
+        return [memory_kb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='2,4,8')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    print(f"Compiled forest: {check_compiled_export()}")
+    print(f"{'workers':>7}  {'config':>6}  {'RSS/worker':>10}  {'PSS/worker':>10}  {'PSS total':>10}")
+    for workers in [int(n) for n in args.workers.split(',')]:
+        for config in CONFIGS:
+            usage = run(config, workers, args.port, args.timeout)
+            rss = sum(r for r, _ in usage) / len(usage)
+            pss = [p for _, p in usage]
+            print(f"{workers:>7}  {config:>6}  {rss / 1024:8.1f}MB  {sum(pss) / len(pss) / 1024:8.1f}MB  "
+                  f"{sum(pss) / 1024:8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Fused dataset pipeline: source recordings -> feature store in one pass.
+
+Runs the streaming slicer from audio_cutting.py and hands each 2 second chunk,
+still in memory as float32 PCM, straight to the shared feature engine. No
+intermediate WAV files are written or re-read, so there is no disk round trip
+and no int16 quantization between slicing and featurizing. Source files are
+processed concurrently, and the result replaces features/store, which
+train_model.py reads.
+
+Row keys match the chunk names audio_cutting.py would produce
+("<label>/<label>_<stem>_<i>.wav"), and --save-chunks also writes those WAV
+files to data/<label>/ for listening or for the two-step pipeline.
+
+Usage:
+    python scripts/build_dataset.py [--input audio_samples] [--workers N] [--save-chunks]
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from feature_engine import extract_feature_vector, extract_feature_batch, FEATURE_NAMES
+from feature_store import FeatureStore
+from audio_cutting import (AUDIO_INPUT_DIR, OUTPUT_BASE_DIR, SR, find_sources, iter_chunks,
+                           chunk_prefix, write_wav)
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features', 'store')
+
+# Chunks featurized per extract_feature_batch call
+FEATURE_BATCH = 64
+
+
+def featurize_source(input_path, label, chunk_length_ms=2000, min_silence_ms=300,
+                     silence_thresh_db=-40, save_dir=None):
+    """
+    Slice and featurize one recording. Returns (keys, features, source seconds)
+    with features as a (chunks, 30) float32 array.
+    """
+    prefix = chunk_prefix(input_path, label)
+    if save_dir:
+        os.makedirs(os.path.join(save_dir, label), exist_ok=True)
+
+    stats = {}
+    keys, rows, batch = [], [], []
+    chunk_samples = int(SR * chunk_length_ms / 1000)
+
+    def flush():
+        if batch:
+            rows.extend(extract_feature_batch(np.stack(batch), SR))
+            batch.clear()
+
+    for i, chunk in enumerate(iter_chunks(input_path, chunk_length_ms, min_silence_ms,
+                                          silence_thresh_db, stats=stats)):
+        name = f"{prefix}_{i}.wav"
+        if save_dir:
+            write_wav(os.path.join(save_dir, label, name), chunk)
+        keys.append(f"{label}/{name}")
+        # Full-length chunks are featurized in batches; only the shorter
+        # final chunk of a recording goes through the single-window path
+        if len(chunk) == chunk_samples:
+            batch.append(chunk)
+            if len(batch) == FEATURE_BATCH:
+                flush()
+        else:
+            flush()
+            rows.append(extract_feature_vector(chunk, SR))
+    flush()
+
+    features = np.array(rows, dtype=np.float32).reshape(len(rows), len(FEATURE_NAMES))
+    return keys, features, stats.get('decoded_samples', 0) / SR
+
+
+def build(sources, store_dir=STORE_DIR, workers=None, save_dir=None, chunk_length_ms=2000,
+          min_silence_ms=300, silence_thresh_db=-40):
+    started = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(featurize_source, path, label, chunk_length_ms, min_silence_ms,
+                            silence_thresh_db, save_dir): (path, label)
+            for path, label in sources
+        }
+        for future in as_completed(futures):
+            path, label = futures[future]
+            keys, features, seconds = future.result()
+            results[path] = (label, keys, features, seconds)
+            print(f" {path}: {len(keys)} chunks from {seconds:.1f}s of audio")
+
+    # Rows in source order, so rebuilding the same corpus gives the same store
+    ordered = [results[path] for path, _ in sources]
+    keys = [key for _, ks, _, _ in ordered for key in ks]
+    labels = [label for label, ks, _, _ in ordered for _ in ks]
+    X = np.concatenate([features for _, _, features, _ in ordered]) if ordered \
+        else np.empty((0, len(FEATURE_NAMES)), np.float32)
+    audio_seconds = sum(seconds for _, _, _, seconds in ordered)
+
+    store = FeatureStore(store_dir)
+    store.clear()
+    store.append(X, labels, FEATURE_NAMES, keys=keys)
+
+    elapsed = time.perf_counter() - started
+    print(f"  {len(keys)} rows written to {store_dir}")
+    print(f"  {audio_seconds:.1f}s of audio in {elapsed:.2f}s "
+          f"({audio_seconds / elapsed:.1f} audio-seconds per second)")
+    return len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice source recordings and extract features in one pass")
+    parser.add_argument('--input', default=AUDIO_INPUT_DIR, help="Directory of source recordings")
+    parser.add_argument('--store', default=STORE_DIR, help="Feature store directory (replaced)")
+    parser.add_argument('--save-chunks', nargs='?', const=OUTPUT_BASE_DIR, default=None, metavar='DIR',
+                        help="Also write the WAV chunks (default dir: data/)")
+    parser.add_argument('--chunk-ms', type=int, default=2000)
+    parser.add_argument('--min-silence-ms', type=int, default=300)
+    parser.add_argument('--silence-thresh', type=float, default=-40, help="dBFS after normalization")
+    parser.add_argument('--workers', type=int, default=None, help="Files processed concurrently (default: all cores)")
+    args = parser.parse_args()
+
+    sources = find_sources(args.input)
+    if not sources:
+        print(f" No source recordings found in {args.input}")
+        return
+    build(sources, args.store, args.workers, args.save_chunks, args.chunk_ms,
+          args.min_silence_ms, args.silence_thresh)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Cached, resumable cross-validated hyperparameter search for train_model.py.
+
+Every (candidate, training data) pair is scored with the same deterministic
+StratifiedKFold splits GridSearchCV uses, and its per-fold accuracies are
+stored on disk under a hash of the data and a hash of the parameters:
+
+    model/search_cache/<data hash>/<params hash>.json
+
+Scores are written after each parallel batch, so an interrupted or
+time-limited run resumes where it stopped, and rerunning on the same data (or
+adding candidates to the grid) only fits what has not been scored yet.
+
+Strategies:
+    grid     every candidate of the grid
+    random   the grid in random order, stopped by --n-iter or the time budget
+    halving  successive halving: all candidates on a small prefix of the
+             (already shuffled) training rows, then the best 1/factor on
+             factor-times more rows, until one candidate is scored on all rows
+"""
+import os
+import json
+import math
+import time
+import hashlib
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold, ParameterGrid, ParameterSampler
+
+STRATEGIES = ('grid', 'random', 'halving')
+
+
+def data_hash(X, y):
+    h = hashlib.sha256()
+    for a in (np.ascontiguousarray(X), np.ascontiguousarray(y)):
+        h.update(f"{a.dtype}{a.shape}".encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def params_hash(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ScoreCache:
+    """Per-fold CV scores on disk; a cache with root=None stores nothing"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, data_key, params):
+        return os.path.join(self.root, data_key, params_hash(params) + '.json')
+
+    def get(self, data_key, params):
+        if self.root is None:
+            return None
+        try:
+            with open(self._path(data_key, params)) as f:
+                return json.load(f)['scores']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def put(self, data_key, params, scores, seconds):
+        if self.root is None:
+            return
+        path = self._path(data_key, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'params': params, 'scores': list(scores), 'fit_seconds': seconds}, f, default=str)
+        os.replace(tmp_path, path)
+
+
+def _fit_score(estimator, params, X, y, train, test):
+    model = clone(estimator).set_params(**params)
+    model.fit(X[train], y[train])
+    return float(model.score(X[test], y[test]))
+
+
+class CachedSearch:
+    def __init__(self, estimator, cache, cv=5, n_jobs=-1, budget=None):
+        self.estimator = estimator
+        self.cache = cache
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.deadline = time.perf_counter() + budget if budget else None
+        self.fits = 0
+        self.cache_hits = 0
+        self.truncated = False
+
+    def expired(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def evaluate(self, candidates, X, y):
+        """
+        Fold scores for each candidate, as {index: [scores]}. Once the time
+        budget runs out, remaining uncached candidates are left out.
+        """
+        X, y = np.asarray(X), np.asarray(y)
+        data_key = data_hash(X, y)
+        folds = list(StratifiedKFold(self.cv).split(X, y))
+
+        results = {}
+        pending = []
+        for i, params in enumerate(candidates):
+            scores = self.cache.get(data_key, params)
+            if scores is not None:
+                results[i] = scores
+                self.cache_hits += 1
+            else:
+                pending.append(i)
+
+        # Enough candidates per batch to keep every worker busy
+        batch = max(1, math.ceil(effective_n_jobs(self.n_jobs) / self.cv))
+        with Parallel(n_jobs=self.n_jobs) as parallel:
+            for start in range(0, len(pending), batch):
+                if self.expired() and results:
+                    self.truncated = True
+                    break
+                chunk = pending[start:start + batch]
+                started = time.perf_counter()
+                scores = parallel(
+                    delayed(_fit_score)(self.estimator, candidates[i], X, y, train, test)
+                    for i in chunk for train, test in folds
+                )
+                seconds = (time.perf_counter() - started) / len(chunk)
+                for j, i in enumerate(chunk):
+                    results[i] = scores[j * self.cv:(j + 1) * self.cv]
+                    self.cache.put(data_key, candidates[i], results[i], seconds)
+                self.fits += len(chunk) * self.cv
+        return results
+
+
+def _ranked(candidates, results, rows):
+    table = [
+        {'params': candidates[i], 'mean': float(np.mean(s)), 'std': float(np.std(s)), 'rows': rows}
+        for i, s in sorted(results.items())
+    ]
+    # Stable sort: ties go to the earlier candidate, as in GridSearchCV
+    return sorted(table, key=lambda r: -r['mean'])
+
+
+def run_search(search, param_grid, X, y, strategy='grid', n_iter=None, factor=3, random_state=42):
+    """
+    Returns the ranked results of the last (largest) round as a list of
+    {'params', 'mean', 'std', 'rows'}, best first.
+    """
+    X, y = np.asarray(X), np.asarray(y)
+    grid = list(ParameterGrid(param_grid))
+    if strategy == 'grid':
+        return _ranked(grid, search.evaluate(grid, X, y), len(X))
+
+    if strategy == 'random':
+        candidates = list(ParameterSampler(param_grid, n_iter=min(n_iter or len(grid), len(grid)),
+                                           random_state=random_state))
+        return _ranked(candidates, search.evaluate(candidates, X, y), len(X))
+
+    if strategy != 'halving':
+        raise ValueError(f"Unknown search strategy {strategy!r}; expected one of {STRATEGIES}")
+
+    n_rounds = 1 + math.ceil(math.log(len(grid), factor)) if len(grid) > 1 else 1
+    min_rows = 20 * search.cv
+    candidates = grid
+    ranked = []
+    for r in range(n_rounds):
+        rows = max(min(min_rows, len(X)), len(X) // factor ** (n_rounds - 1 - r))
+        results = search.evaluate(candidates, X[:rows], y[:rows])
+        if not results:
+            break
+        ranked = _ranked(candidates, results, rows)
+        print(f"  Halving round {r + 1}/{n_rounds}: {len(results)} candidates on {rows} rows, "
+              f"best {ranked[0]['mean'] * 100:.2f}%")
+        if search.truncated:
+            break
+        keep = max(1, math.ceil(len(ranked) / factor))
+        candidates = [entry['params'] for entry in ranked[:keep]]
+    return ranked
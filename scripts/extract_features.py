@@ -1,47 +1,142 @@
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-import librosa
+
+# Share the fused feature engine with the web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from feature_engine import extract_feature_vector, FEATURE_NAMES, FEATURE_CONFIG
+from feature_store import FeatureStore
+from audio_decoder import load_file
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 FEATURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'features')
+MANIFEST_PATH = os.path.join(FEATURES_DIR, 'manifest.json')
+STORE_DIR = os.path.join(FEATURES_DIR, 'store')
+LABELS = ['real', 'fake']
 os.makedirs(FEATURES_DIR, exist_ok=True)
 
+def feature_config_hash():
+    """Changes whenever the feature definition changes, invalidating the manifest"""
+    return hashlib.sha256(json.dumps(FEATURE_CONFIG, sort_keys=True).encode()).hexdigest()[:16]
+
 def extract_features_from_file(file_path):
-    y, sr = librosa.load(file_path, sr=16000)  #   Already resampled by pydub
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    zcr = librosa.feature.zero_crossing_rate(y)
-    spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)
-
-    features = np.hstack([
-        np.mean(mfcc, axis=1),
-        np.std(mfcc, axis=1),
-        np.mean(zcr),
-        np.std(zcr),
-        np.mean(spec_cent),
-        np.std(spec_cent)
-    ])
-    return features
-
-def process_dataset():
-    dataset = []
-    for label in ['real', 'fake']:
+    # Chunks are already 16 kHz mono 16-bit WAV, so this is a direct read
+    # with no resampling
+    return extract_feature_vector(load_file(file_path, sr=16000), 16000)
+
+def _extract_worker(file_path):
+    # Runs in a worker process; returns plain lists so results pickle cheaply
+    return extract_features_from_file(file_path).tolist()
+
+def list_corpus():
+    """(relative path, label, absolute path, mtime, size) for every chunk"""
+    corpus = []
+    for label in LABELS:
         label_dir = os.path.join(DATA_DIR, label)
-        for file_name in os.listdir(label_dir):
-            if file_name.endswith('.wav'):
-                file_path = os.path.join(label_dir, file_name)
-                print(f" Extracting from: {file_path}")
-                features = extract_features_from_file(file_path)
-                dataset.append(np.append(features, label))
-    
+        if not os.path.isdir(label_dir):
+            continue
+        for entry in os.scandir(label_dir):
+            if entry.is_file() and entry.name.endswith('.wav'):
+                stat = entry.stat()
+                corpus.append((f"{label}/{entry.name}", label, entry.path, stat.st_mtime_ns, stat.st_size))
+    return sorted(corpus)
+
+def load_manifest(config_hash):
+    """Previously extracted features, or an empty manifest if the feature config changed"""
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('config_hash') != config_hash:
+        print("  Feature config changed, re-extracting everything")
+        return {}
+    return manifest.get('files', {})
+
+def save_manifest(config_hash, files):
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'config_hash': config_hash, 'files': files}, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def update_store(files, extracted):
+    """
+    Bring the binary feature store in line with the manifest: append a shard
+    for brand-new chunks, or rewrite it when chunks changed or disappeared.
+    """
+    store = FeatureStore(STORE_DIR)
+    stored = set(store.keys()) if store.exists() else set()
+    current = set(files)
+    changed = stored & set(extracted)
+
+    if store.exists() and not changed and stored <= current:
+        new_keys = sorted(current - stored)
+        if not new_keys:
+            print(f"  Feature store up to date ({store.rows} rows)")
+            return
+        print(f"  Appending {len(new_keys)} rows to the feature store")
+    else:
+        store.clear()
+        new_keys = sorted(current)
+        print(f"  Writing {len(new_keys)} rows to a fresh feature store")
+
+    X = np.array([files[key]['features'] for key in new_keys], dtype=np.float32).reshape(len(new_keys), len(FEATURE_NAMES))
+    labels = [files[key]['label'] for key in new_keys]
+    store.append(X, labels, FEATURE_NAMES, keys=new_keys)
+
+def write_csv(files):
     # Create DataFrame
-    feature_names = [f'mfcc_mean_{i}' for i in range(13)] + \
-                    [f'mfcc_std_{i}' for i in range(13)] + \
-                    ['zcr_mean', 'zcr_std', 'spec_cent_mean', 'spec_cent_std'] + \
-                    ['label']
-    df = pd.DataFrame(dataset, columns=feature_names)
+    feature_names = FEATURE_NAMES + ['label']
+    rows = [entry['features'] + [entry['label']] for _, entry in sorted(files.items())]
+    df = pd.DataFrame(rows, columns=feature_names)
     df.to_csv(os.path.join(FEATURES_DIR, 'dataset.csv'), index=False)
     print("  Features saved to features/dataset.csv")
 
+def process_dataset(workers=None, full=False, csv=False):
+    started = time.perf_counter()
+    config_hash = feature_config_hash()
+    previous = {} if full else load_manifest(config_hash)
+
+    # Only new or changed chunks (by mtime and size) are featurized again
+    files = {}
+    todo = []
+    for rel_path, label, file_path, mtime, size in list_corpus():
+        entry = previous.get(rel_path)
+        if entry and entry['mtime'] == mtime and entry['size'] == size and entry['label'] == label:
+            files[rel_path] = entry
+        else:
+            files[rel_path] = {'label': label, 'mtime': mtime, 'size': size}
+            todo.append((rel_path, file_path))
+
+    print(f" {len(files)} chunks, {len(files) - len(todo)} unchanged, {len(todo)} to extract")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            paths = [file_path for _, file_path in todo]
+            for (rel_path, file_path), features in zip(todo, executor.map(_extract_worker, paths, chunksize=8)):
+                print(f" Extracting from: {file_path}")
+                files[rel_path]['features'] = features
+        save_manifest(config_hash, files)
+    elif len(files) != len(previous):
+        # Chunks were deleted; drop them from the manifest
+        save_manifest(config_hash, files)
+
+    update_store(files, [rel_path for rel_path, _ in todo])
+    print(f"  Features saved to {STORE_DIR}")
+    if csv:
+        write_csv(files)
+    print(f"  Done in {time.perf_counter() - started:.2f}s")
+
 if __name__ == "__main__":
-    process_dataset()
+    parser = argparse.ArgumentParser(description="Extract training features from data/<label>/*.wav")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--full', action='store_true', help="Ignore the manifest and re-extract every chunk")
+    parser.add_argument('--csv', action='store_true', help="Also write features/dataset.csv for inspection")
+    args = parser.parse_args()
+    process_dataset(workers=args.workers, full=args.full, csv=args.csv)
@@ -0,0 +1,116 @@
+"""
+Columnar binary feature store for the training set.
+
+Replaces features/dataset.csv. Features are stored as float32 `.npy` shards
+(one row per chunk, one column per feature) with a separate int8 label array
+per shard, and an index.json describing the shards, column names and label
+encoding. A single-shard store loads as a zero-copy memory map; new shards
+can be appended without rewriting existing ones, and `compact()` merges them.
+
+Layout:
+    features/store/index.json
+    features/store/X-00000.npy   float32 (rows, 30)
+    features/store/y-00000.npy   int8    (rows,)
+"""
+import os
+import json
+import time
+
+import numpy as np
+
+# Same encoding train_model.py has always used for the CSV labels
+LABEL_CODES = {'fake': 0, 'real': 1}
+
+
+class FeatureStore:
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_index(self, index):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def exists(self):
+        return self._read_index() is not None
+
+    @property
+    def shards(self):
+        index = self._read_index()
+        return index['shards'] if index else []
+
+    @property
+    def rows(self):
+        return sum(shard['rows'] for shard in self.shards)
+
+    def keys(self):
+        """Source keys (e.g. chunk paths) of every stored row, in order"""
+        return [key for shard in self.shards for key in shard.get('keys', [])]
+
+    def clear(self):
+        for shard in self.shards:
+            for name in (shard['X'], shard['y']):
+                path = os.path.join(self.root, name)
+                if os.path.exists(path):
+                    os.remove(path)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    def append(self, X, labels, columns, keys=None):
+        """Write one new shard; `labels` may be label names or integer codes"""
+        os.makedirs(self.root, exist_ok=True)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        y = np.asarray([LABEL_CODES[l] if isinstance(l, str) else l for l in labels], dtype=np.int8)
+        if X.ndim != 2 or len(X) != len(y):
+            raise ValueError(f"Expected (rows, features) and (rows,), got {X.shape} and {y.shape}")
+
+        index = self._read_index() or {'columns': list(columns), 'labels': LABEL_CODES, 'shards': []}
+        if index['columns'] != list(columns):
+            raise ValueError("Column layout differs from the existing store; clear() it first")
+
+        n = len(index['shards'])
+        shard = {'X': f'X-{n:05d}.npy', 'y': f'y-{n:05d}.npy', 'rows': len(X), 'created': time.time()}
+        if keys is not None:
+            shard['keys'] = list(keys)
+        np.save(os.path.join(self.root, shard['X']), X)
+        np.save(os.path.join(self.root, shard['y']), y)
+
+        # The index is written last, so readers never see a half-written shard
+        index['shards'].append(shard)
+        self._write_index(index)
+        return shard['X']
+
+    def load(self, mmap=True):
+        """
+        Return (X, y, columns). With a single shard and mmap=True the arrays
+        are read-only memory maps (no copy); multiple shards are concatenated.
+        """
+        index = self._read_index()
+        if index is None:
+            raise FileNotFoundError(f"No feature store at {self.root}")
+        mode = 'r' if mmap else None
+        Xs = [np.load(os.path.join(self.root, s['X']), mmap_mode=mode) for s in index['shards']]
+        ys = [np.load(os.path.join(self.root, s['y']), mmap_mode=mode) for s in index['shards']]
+        if len(Xs) == 1:
+            return Xs[0], ys[0], index['columns']
+        if not Xs:
+            return np.empty((0, len(index['columns'])), np.float32), np.empty(0, np.int8), index['columns']
+        return np.concatenate(Xs), np.concatenate(ys), index['columns']
+
+    def compact(self):
+        """Merge all shards into one so the store loads zero-copy again"""
+        if len(self.shards) <= 1:
+            return
+        keys = self.keys()
+        X, y, columns = self.load(mmap=False)
+        self.clear()
+        self.append(X, y, columns, keys=keys if len(keys) == len(X) else None)
@@ -0,0 +1,90 @@
+"""
+Local test client for the live scoring endpoint.
+
+Plays an audio file (or a synthetic tone) at real-time pace into a rolling
+2 second buffer, posts the buffer to /api/live/score every hop like the
+browser does, and reports request latency plus time-to-first-verdict measured
+from the moment "recording" started.
+
+Usage:
+    python scripts/live_client.py [audio.wav] [--url http://localhost:5000] [--hop 0.5]
+"""
+import argparse
+import json
+import subprocess
+import time
+import urllib.request
+
+import numpy as np
+
+SR = 16000
+WINDOW_SECONDS = 2.0
+
+
+def load_audio(path):
+    if path is None:
+        # 6 seconds of a ticking-ish tone when no recording is given
+        t = np.arange(int(6 * SR)) / SR
+        return (0.3 * np.sin(2 * np.pi * 440 * t) * (np.sin(2 * np.pi * 4 * t) > 0.9)).astype(np.float32)
+    result = subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', path, '-f', 'f32le', '-ac', '1', '-ar', str(SR), 'pipe:1'],
+        capture_output=True, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype='<f4')
+
+
+def post_window(url, window):
+    request = urllib.request.Request(
+        f"{url}/api/live/score?sr={SR}&dtype=float32",
+        data=window.astype('<f4').tobytes(),
+        headers={'Content-Type': 'application/octet-stream'},
+        method='POST',
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', nargs='?', help='Recording to replay (default: synthetic tone)')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--hop', type=float, default=0.5, help='Seconds between posts')
+    args = parser.parse_args()
+
+    y = load_audio(args.audio)
+    window = int(WINDOW_SECONDS * SR)
+    hop = int(args.hop * SR)
+    print(f"Replaying {len(y) / SR:.1f}s of audio, posting a {WINDOW_SECONDS:g}s window every {args.hop:g}s")
+
+    latencies = []
+    first_verdict = None
+    record_start = time.perf_counter()
+    for end in range(window, len(y) + 1, hop):
+        # Wait until this much audio would have been captured in real time
+        capture_time = record_start + end / SR
+        delay = capture_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        sent = time.perf_counter()
+        data = post_window(args.url, y[end - window:end])
+        received = time.perf_counter()
+        latencies.append((received - sent) * 1000)
+
+        verdict = data.get('verdict', {})
+        if first_verdict is None and verdict.get('result'):
+            first_verdict = received - record_start
+        print(f"t={end / SR:5.2f}s  {verdict.get('result')!s:>5} {verdict.get('confidence', 0):5.1f}%  "
+              f"rtt {latencies[-1]:6.1f} ms (server {data.get('server_ms', 0):.1f} ms)")
+
+    if latencies:
+        print(f"\nRequests: {len(latencies)}  p50 {np.percentile(latencies, 50):.1f} ms  "
+              f"p95 {np.percentile(latencies, 95):.1f} ms  max {max(latencies):.1f} ms")
+    if first_verdict is not None:
+        print(f"Time to first verdict from start of recording: {first_verdict:.2f}s")
+    else:
+        print("No verdict (all windows silent or audio shorter than one window)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,68 @@
 import os
+import sys
+import json
+import time
+import argparse
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 from sklearn.pipeline import Pipeline
+from sklearn.base import clone
 from sklearn.preprocessing import StandardScaler
 import joblib
 
+# Share the NumPy forest compiler with the web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+from forest_compiler import (compile_model, compiled_path_for, save_compiled, load_compiled, prune_to_budget,
+                             stored_bytes)
+from feature_store import FeatureStore
+from cv_search import CachedSearch, ScoreCache, run_search, STRATEGIES
+from bench_inference import time_per_call
+from model_registry import ModelRegistry
+from feature_engine import FEATURE_CONFIG
+
 # Paths (keep directory structure intact)
 FEATURES_PATH = os.path.join(os.path.dirname(__file__), '..', 'features', 'dataset.csv')
+STORE_DIR = os.path.join(os.path.dirname(__file__), '..', 'features', 'store')
 MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'model')
+SEARCH_CACHE_DIR = os.path.join(MODEL_DIR, 'search_cache')
+RUN_LOG_PATH = os.path.join(MODEL_DIR, 'training_runs.jsonl')
+REGISTRY_DIR = os.path.join(MODEL_DIR, 'registry')
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-# Load dataset
-df = pd.read_csv(FEATURES_PATH)
-
-# Encode labels
-df['label'] = df['label'].map({'real': 1, 'fake': 0})
-
-# Split features and target
-X = df.drop('label', axis=1)
-y = df['label']
+parser = argparse.ArgumentParser(description="Train the real/fake classifier")
+parser.add_argument('--search', choices=STRATEGIES, default='grid', help="Hyperparameter search strategy")
+parser.add_argument('--budget', type=float, default=None, help="Stop fitting new candidates after this many seconds")
+parser.add_argument('--n-iter', type=int, default=None, help="Candidates to try with --search random")
+parser.add_argument('--factor', type=int, default=3, help="Halving factor for --search halving")
+parser.add_argument('--no-cache', action='store_true', help="Ignore and don't write cached fold scores")
+parser.add_argument('--export-profile', choices=('exact', 'compact'), default='exact',
+                    help="exact: compiled forest identical to sklearn; compact: fewer/shallower trees")
+parser.add_argument('--no-activate', action='store_true',
+                    help="Publish to the model registry without making it the served version")
+parser.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                    help="Validation accuracy the compact profile may give up (0.005 = half a point)")
+args = parser.parse_args()
+run_started = time.perf_counter()
+
+# Load dataset: the binary feature store (zero-copy memory map) when present,
+# otherwise the legacy CSV
+store = FeatureStore(STORE_DIR)
+if store.exists():
+    X_values, y_values, columns = store.load()
+    X = pd.DataFrame(X_values, columns=columns, copy=False)
+    y = pd.Series(y_values, name='label')
+else:
+    df = pd.read_csv(FEATURES_PATH)
+
+    # Encode labels
+    df['label'] = df['label'].map({'real': 1, 'fake': 0})
+
+    # Split features and target
+    X = df.drop('label', axis=1)
+    y = df['label']
 
 # Train-test split
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -46,13 +87,21 @@ pipeline = Pipeline([
     ('classifier', base_model)
 ])
 
-# Perform grid search with cross-validation
-grid_search = GridSearchCV(pipeline, param_grid, cv=5, n_jobs=-1, scoring='accuracy')
-grid_search.fit(X_train, y_train)
-
-# Get best model from grid search
-best_model = grid_search.best_estimator_
-print("Best hyperparameters found:", grid_search.best_params_)
+# Cross-validated search; fold scores are cached per (data, params), so
+# reruns only fit candidates that haven't been scored on this data yet
+search = CachedSearch(pipeline, ScoreCache(None if args.no_cache else SEARCH_CACHE_DIR), cv=5, n_jobs=-1,
+                      budget=args.budget)
+ranked = run_search(search, param_grid, X_train, y_train, strategy=args.search, n_iter=args.n_iter,
+                    factor=args.factor)
+search_seconds = time.perf_counter() - run_started
+best = ranked[0]
+print(f"Search ({args.search}): {search.fits} fits, {search.cache_hits} cached candidates, "
+      f"{search_seconds:.1f}s" + (" (stopped by time budget)" if search.truncated else ""))
+print("Best hyperparameters found:", best['params'])
+
+# Refit the best candidate once on the full training split
+best_model = clone(pipeline).set_params(**best['params'])
+best_model.fit(X_train, y_train)
 
 # Evaluate on test set
 y_pred = best_model.predict(X_test)
@@ -65,9 +114,9 @@ print(confusion_matrix(y_test, y_pred))
 print("Classification Report:")
 print(classification_report(y_test, y_pred))
 
-# Cross-validation accuracy on entire dataset
-cv_scores = cross_val_score(best_model, X, y, cv=5, scoring='accuracy')
-print(f"Mean Cross-Validation Accuracy: {np.mean(cv_scores) * 100:.2f}%")
+# Cross-validation accuracy from the search itself (no second round of fits)
+print(f"Mean Cross-Validation Accuracy: {best['mean'] * 100:.2f}% "
+      f"(+/- {best['std'] * 100:.2f}, {best['rows']} training rows)")
 
 # Extract feature importances from the RandomForest model inside the pipeline
 rf_model = best_model.named_steps['classifier']
@@ -83,3 +132,80 @@ for idx in sorted_idx:
 MODEL_PATH = os.path.join(MODEL_DIR, 'rolex_model.pkl')
 joblib.dump(best_model, MODEL_PATH)
 print(f"Model saved to {MODEL_PATH}")
+
+# Export the flattened forest for the NumPy inference engine. The exact
+# profile must reproduce sklearn's probabilities exactly; the compact one caps
+# tree count and depth within the accuracy-drop budget. The caps are chosen
+# on a validation split of the training rows, scored by a forest fitted
+# without them, so X_test stays untouched for the report below
+if args.export_profile == 'compact':
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=42)
+    selector = clone(pipeline).set_params(**best['params']).fit(X_fit, y_fit)
+    pruned, full_val_accuracy, val_accuracy = prune_to_budget(selector, X_val.values, y_val,
+                                                              args.max_accuracy_drop)
+    estimators = selector.named_steps['classifier'].estimators_
+    max_trees = pruned.n_trees if pruned.n_trees < len(estimators) else None
+    max_depth = pruned.max_depth if pruned.max_depth < max(e.tree_.max_depth for e in estimators) else None
+    compiled = compile_model(best_model, max_trees=max_trees, max_depth=max_depth)
+    compiled_accuracy = float(np.mean(compiled.predict(X_test.values) == np.asarray(y_test)))
+    print(f"Compact profile: {compiled.n_trees} trees, depth {compiled.max_depth}, validation accuracy "
+          f"{val_accuracy * 100:.2f}% (full forest {full_val_accuracy * 100:.2f}%), "
+          f"test accuracy {compiled_accuracy * 100:.2f}% (full forest {accuracy * 100:.2f}%)")
+else:
+    compiled = compile_model(best_model)
+    np.testing.assert_array_equal(compiled.predict_proba(X_test.values), best_model.predict_proba(X_test))
+    compiled_accuracy = accuracy
+COMPILED_PATH = compiled_path_for(MODEL_PATH)
+save_compiled(compiled, COMPILED_PATH)
+print(f"Compiled forest ({compiled.n_trees} trees, {len(compiled.feature)} nodes) saved to {COMPILED_PATH}")
+
+# Size, load time and latency of what the web app would load
+X_batch = X_test.values[:1000]
+print(f"\n{'':>9}  {'size':>9}  {'load':>9}  {'1 row':>10}  {'batch/row':>10}  accuracy")
+for name, path, load, acc in [
+    ("sklearn", MODEL_PATH, joblib.load, accuracy),
+    ("compiled", COMPILED_PATH, load_compiled, compiled_accuracy),
+]:
+    started = time.perf_counter()
+    loaded = load(path)
+    load_ms = (time.perf_counter() - started) * 1e3
+    row = time_per_call(loaded.predict_proba, X_batch[:1], 200)
+    batch = time_per_call(loaded.predict_proba, X_batch, 10)
+    print(f"{name:>9}  {stored_bytes(path) / 1e6:7.2f}MB  {load_ms:7.1f}ms  {row * 1e6:8.1f}µs  "
+          f"{batch / len(X_batch) * 1e6:8.2f}µs  {acc * 100:.2f}%")
+
+# Publish a registry version; running servers switch to it between requests
+version = ModelRegistry(REGISTRY_DIR).publish(MODEL_PATH, {
+    'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'feature_names': list(X.columns),
+    'feature_config': FEATURE_CONFIG,
+    'params': best['params'],
+    'rows': len(X),
+    'metrics': {'test_accuracy': accuracy, 'cv_accuracy': best['mean'], 'compiled_accuracy': compiled_accuracy},
+    'export_profile': args.export_profile,
+}, compiled=compiled, activate=not args.no_activate)
+print(f"Published model version {version} to {REGISTRY_DIR}" + ("" if args.no_activate else " (active)"))
+
+# Wall time per training run, appended to model/training_runs.jsonl
+run_seconds = time.perf_counter() - run_started
+print(f"Training run took {run_seconds:.1f}s")
+with open(RUN_LOG_PATH, 'a') as f:
+    f.write(json.dumps({
+        'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'search': args.search,
+        'budget': args.budget,
+        'rows': len(X),
+        'fits': search.fits,
+        'cached_candidates': search.cache_hits,
+        'truncated': search.truncated,
+        'best_params': best['params'],
+        'cv_accuracy': best['mean'],
+        'test_accuracy': accuracy,
+        'version': version,
+        'export_profile': args.export_profile,
+        'compiled_accuracy': compiled_accuracy,
+        'compiled_trees': compiled.n_trees,
+        'compiled_depth': compiled.max_depth,
+        'search_seconds': round(search_seconds, 3),
+        'wall_seconds': round(run_seconds, 3),
+    }, default=str) + '\n')